@@ -1,6 +1,22 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, stream_template, stream_with_context, request, jsonify, send_file, Response, g
+from werkzeug.middleware.proxy_fix import ProxyFix
 import requests
 from datetime import datetime
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+import threading
+import hashlib
+import uuid
+import re
+import atexit
+import base64
+import sys
+import time
+import math
+import queue
 import json
 import io
 import os
@@ -9,6 +25,25 @@ import os
 # CONFIGURAÇÕES
 # ========================================
 
+def ler_credenciais_env():
+    """Lê CREDENCIAIS (lista JSON); vazio ou inválido vira lista vazia"""
+    bruto = os.getenv('CREDENCIAIS', '').strip()
+    if not bruto:
+        return []
+    
+    try:
+        credenciais = json.loads(bruto)
+    except ValueError as e:
+        print(f"❌ CREDENCIAIS não é um JSON válido ({str(e)}) - ignorando")
+        return []
+    
+    if not isinstance(credenciais, list) or not all(isinstance(c, dict) for c in credenciais):
+        print("❌ CREDENCIAIS deve ser uma lista de objetos JSON - ignorando")
+        return []
+    
+    return credenciais
+
+
 def carregar_configuracoes():
     """Carrega configurações do config.py ou variáveis de ambiente"""
     try:
@@ -24,55 +59,678 @@ def carregar_configuracoes():
                 'CLIENT_SECRET': os.getenv('CLIENT_SECRET', ''),
                 'REDIRECT_URI': os.getenv('REDIRECT_URI', 'http://localhost:5000/callback'),
                 'API_BASE_URL': 'https://api.mercadolibre.com',
+                'SITE_ID': os.getenv('SITE_ID', 'MLB'),
                 'ACCESS_TOKEN': os.getenv('ACCESS_TOKEN', ''),
                 'REFRESH_TOKEN': os.getenv('REFRESH_TOKEN', ''),
-                'USER_ID': os.getenv('USER_ID', '')
+                'USER_ID': os.getenv('USER_ID', ''),
+                # Lista JSON de credenciais extras: [{"CLIENT_ID": ..., "CLIENT_SECRET": ..., ...}]
+                'CREDENCIAIS': ler_credenciais_env()
             },
             {
                 'DEBUG': os.getenv('DEBUG', 'False').lower() == 'true',
                 'HOST': '0.0.0.0',
                 'PORT': int(os.getenv('PORT', 5000)),
-                'SECRET_KEY': os.getenv('SECRET_KEY', 'change-this-secret-key')
+                'SECRET_KEY': os.getenv('SECRET_KEY', 'change-this-secret-key'),
+                'PROXIES_CONFIAVEIS': int(os.getenv('PROXIES_CONFIAVEIS', 1)),
+                # Vagas, fila e assinantes SSE prendem uma thread cada; com gthread
+                # a soma é reduzida na inicialização para caber nas threads do worker
+                'MAX_SIMULTANEAS': int(os.getenv('MAX_SIMULTANEAS', 16)),
+                'MAX_FILA': int(os.getenv('MAX_FILA', 8)),
+                # Cada conexão SSE em /eventos prende uma thread enquanto a aba fica aberta
+                'MAX_ASSINANTES_SSE': int(os.getenv('MAX_ASSINANTES_SSE', 8)),
+                'ESPERA_MAX_FILA': float(os.getenv('ESPERA_MAX_FILA', 5)),
+                'TAXA_INTERATIVA': float(os.getenv('TAXA_INTERATIVA', 5)),
+                'RAJADA_INTERATIVA': int(os.getenv('RAJADA_INTERATIVA', 20)),
+                'TAXA_BULK': float(os.getenv('TAXA_BULK', 1)),
+                'RAJADA_BULK': int(os.getenv('RAJADA_BULK', 5))
             },
             {
-                'MAX_HISTORICO': int(os.getenv('MAX_HISTORICO', 50))
+                'MAX_HISTORICO': int(os.getenv('MAX_HISTORICO', 50)),
+                'MAX_PONTOS_SERIE': int(os.getenv('MAX_PONTOS_SERIE', 100000)),
+                'MAX_SERIES': int(os.getenv('MAX_SERIES', 5000)),
+                'TTL_PESQUISA': int(os.getenv('TTL_PESQUISA', 60)),
+                'MAX_CACHE_PESQUISA': int(os.getenv('MAX_CACHE_PESQUISA', 500)),
+                'MAX_CACHE_PAGINAS': int(os.getenv('MAX_CACHE_PAGINAS', 50)),
+                'SNAPSHOT_PATH': os.getenv('SNAPSHOT_PATH', 'snapshot.json'),
+                'INTERVALO_SNAPSHOT': int(os.getenv('INTERVALO_SNAPSHOT', 300))
             }
         )
 
 MERCADOLIVRE_CONFIG, FLASK_CONFIG, DATABASE_CONFIG = carregar_configuracoes()
 
+# ========================================
+# ESTADO COMPARTILHADO
+# ========================================
+# Com workers gthread/gevent várias requisições rodam no mesmo processo.
+# Todo estado mutável fica atrás de um lock (o gevent faz monkey-patch de
+# threading, então o mesmo lock também serializa greenlets).
+
+class HistoricoBuscas:
+    """Histórico de buscas em memória, seguro para threads e greenlets"""
+    
+    def __init__(self, max_itens):
+        self._lock = threading.RLock()
+        self._itens = []
+        self.max_itens = max_itens
+        self.seq = 0
+        self.reset_seq = 0
+    
+    def adicionar(self, produto):
+        """Insere (ou move para o topo) um produto e notifica os clientes SSE"""
+        with self._lock:
+            self.seq += 1
+            produto['seq'] = self.seq
+            
+            itens = [p for p in self._itens if p['id'] != produto['id']]
+            itens.insert(0, produto)
+            del itens[self.max_itens:]
+            self._itens = itens
+            
+            # Publica dentro do lock para os eventos saírem na ordem de seq
+            publicar_evento('historico', resumo_produto(produto), produto['seq'])
+            return produto
+    
+    def limpar(self):
+        """Esvazia o histórico e retorna a nova versão"""
+        with self._lock:
+            self._itens = []
+            self.seq += 1
+            self.reset_seq = self.seq
+            publicar_evento('limpo', {'versao': self.seq}, self.seq)
+            return self.seq
+    
+    def listar(self):
+        """Retorna uma cópia da lista atual (mais recente primeiro)"""
+        with self._lock:
+            return list(self._itens)
+    
+    def buscar(self, mlb_code):
+        """Retorna o produto do histórico com o código informado"""
+        with self._lock:
+            return next((p for p in self._itens if p['id'] == mlb_code), None)
+    
+    def exportar(self):
+        with self._lock:
+            return {'seq': self.seq, 'reset_seq': self.reset_seq, 'itens': list(self._itens)}
+    
+    def importar(self, dados):
+        with self._lock:
+            self.seq = dados['seq']
+            self.reset_seq = dados['reset_seq']
+            self._itens = dados['itens'][:self.max_itens]
+    
+    def desde(self, since):
+        """Retorna (versao, completo, itens) com o que mudou após `since`"""
+        with self._lock:
+            # Cursor anterior a uma limpeza (ou de outra instância): envia tudo
+            completo = since == 0 or since < self.reset_seq or since > self.seq
+            itens = [p for p in self._itens if completo or p['seq'] > since]
+            return self.seq, completo, itens
+
+
+class Credencial:
+    """Um app/vendedor do Mercado Livre com seu próprio token e ciclo de renovação"""
+    
+    def __init__(self, nome, config):
+        self.nome = nome
+        self.config = config
+        self.token = config.get('ACCESS_TOKEN') or None
+        self._lock_renovacao = threading.Lock()
+        self._lock = threading.Lock()
+        self.em_uso = 0
+        self.ultimo_uso = 0.0
+        self.restante = None            # último X-RateLimit-Remaining visto
+        self.penalidade = 0.0           # 429 recentes, decai pela metade a cada minuto
+        self.penalidade_em = time.monotonic()
+        self.falhas_renovacao = 0
+        self.fora_ate = 0.0             # fora de rotação até este instante (monotonic)
+        self.motivo_fora = None         # 'cota' (429) ou 'autenticacao' (renovação falhou)
+        self.rejeitados = set()         # tokens recusados com 401, nunca reaproveitados
+    
+    def _penalidade_atual(self, agora):
+        return self.penalidade * 0.5 ** ((agora - self.penalidade_em) / 60)
+    
+    def disponivel(self, agora):
+        return agora >= self.fora_ate
+    
+    def prioridade(self, agora):
+        """Chave de ordenação: menos 429 recentes, mais orçamento, menos em curso, menos recente"""
+        restante = self.restante if self.restante is not None else float('inf')
+        return (round(self._penalidade_atual(agora), 1), -restante, self.em_uso, self.ultimo_uso)
+    
+    def renovar(self, token_expirado=None):
+        """Renova o token, a menos que outra thread já o tenha feito"""
+        with self._lock_renovacao:
+            if self.token and self.token != token_expirado and self.token not in self.rejeitados:
+                return self.token
+            
+            if token_expirado:
+                self.rejeitados.add(token_expirado)
+            
+            novo = solicitar_access_token(self.config, self.rejeitados)
+            if novo in self.rejeitados:
+                novo = None
+            
+            with self._lock:
+                if novo:
+                    self.token = novo
+                    self.falhas_renovacao = 0
+                    # Tokens renovados expiram sozinhos; só o fixo precisa ficar lembrado
+                    self.rejeitados &= {self.config.get('ACCESS_TOKEN')}
+                else:
+                    # Sai de rotação; o intervalo dobra a cada falha (máx. 1h)
+                    self.token = None
+                    self.falhas_renovacao += 1
+                    espera = min(60 * 2 ** (self.falhas_renovacao - 1), 3600)
+                    self.fora_ate = time.monotonic() + espera
+                    self.motivo_fora = 'autenticacao'
+                    print(f"⛔ Credencial {self.nome} fora de rotação por {espera}s")
+            return novo
+    
+    def registrar_resposta(self, response):
+        """Atualiza orçamento e penalidades a partir de uma resposta da API"""
+        agora = time.monotonic()
+        with self._lock:
+            restante = response.headers.get('X-RateLimit-Remaining')
+            if restante is not None and restante.isdigit():
+                self.restante = int(restante)
+            
+            if response.status_code == 429:
+                self.penalidade = self._penalidade_atual(agora) + 1
+                self.penalidade_em = agora
+                retry_after = response.headers.get('Retry-After', '')
+                self.fora_ate = agora + (int(retry_after) if retry_after.isdigit() else 10)
+                self.motivo_fora = 'cota'
+    
+    def estado(self):
+        agora = time.monotonic()
+        return {
+            'nome': self.nome,
+            'tem_token': bool(self.token),
+            'em_rotacao': self.disponivel(agora),
+            'motivo_fora': None if self.disponivel(agora) else self.motivo_fora,
+            'em_uso': self.em_uso,
+            'restante': self.restante,
+            'penalidade_429': round(self._penalidade_atual(agora), 2),
+            'falhas_renovacao': self.falhas_renovacao
+        }
+
+
+class PoolCredenciais:
+    """Distribui as requisições entre várias credenciais"""
+    
+    def __init__(self, credenciais):
+        self._lock = threading.Lock()
+        self.credenciais = credenciais
+    
+    def __len__(self):
+        return len(self.credenciais)
+    
+    def escolher(self, excluir=()):
+        """Reserva a melhor credencial disponível (ou None); devolva com liberar()"""
+        agora = time.monotonic()
+        with self._lock:
+            candidatas = [
+                c for c in self.credenciais
+                if c not in excluir and c.disponivel(agora)
+            ]
+            if not candidatas:
+                return None
+            credencial = min(candidatas, key=lambda c: c.prioridade(agora))
+            credencial.em_uso += 1
+            credencial.ultimo_uso = agora
+            return credencial
+    
+    def liberar(self, credencial):
+        with self._lock:
+            credencial.em_uso -= 1
+    
+    def renovar_todas(self):
+        """Obtém o token de todas as credenciais que ainda não têm um"""
+        return [c.renovar() for c in self.credenciais if not c.token]
+    
+    def segundos_ate_cota(self):
+        """Quanto falta para uma credencial sem cota (429) voltar à rotação; None se não há nenhuma"""
+        agora = time.monotonic()
+        with self._lock:
+            esperas = [
+                c.fora_ate - agora for c in self.credenciais
+                if c.motivo_fora == 'cota' and not c.disponivel(agora)
+            ]
+        if not esperas:
+            return None
+        return max(1, math.ceil(min(esperas)))
+    
+    def estado(self):
+        return [c.estado() for c in self.credenciais]
+
+
+def carregar_credenciais(config):
+    """Monta as credenciais a partir de CREDENCIAIS (lista) ou das chaves avulsas"""
+    lista = config.get('CREDENCIAIS') or [config]
+    credenciais = []
+    
+    for i, cred in enumerate(lista, 1):
+        if not any(cred.get(k) for k in ('ACCESS_TOKEN', 'REFRESH_TOKEN', 'CLIENT_ID')):
+            continue
+        nome = cred.get('NOME') or cred.get('CLIENT_ID') or f'credencial-{i}'
+        credenciais.append(Credencial(nome, cred))
+    
+    return credenciais
+
+
+class SerieTemporal:
+    """Observações de preço, estoque e vendas de um item em arrays compactos"""
+    
+    # Pontos por bloco; cada bloco guarda o timestamp absoluto do 1º ponto
+    BLOCO = 1024
+    
+    __slots__ = ('ultimo', 'marcos', 'deltas', 'precos', 'estoques', 'vendidos')
+    
+    def __init__(self):
+        self.ultimo = 0                 # timestamp (s) do último ponto
+        self.marcos = array('q')        # timestamp do 1º ponto de cada bloco
+        self.deltas = array('I')        # segundos desde o ponto anterior
+        self.precos = array('d')        # NaN quando ausente
+        self.estoques = array('i')      # -1 quando ausente
+        self.vendidos = array('i')      # -1 quando ausente
+    
+    def __len__(self):
+        return len(self.deltas)
+    
+    def adicionar(self, ts, preco, estoque, vendidos):
+        delta = max(0, ts - self.ultimo) if self.deltas else 0
+        self.ultimo = ts if not self.deltas else self.ultimo + delta
+        if len(self.deltas) % self.BLOCO == 0:
+            self.marcos.append(self.ultimo)
+        self.deltas.append(delta)
+        self.precos.append(math.nan if preco is None else float(preco))
+        self.estoques.append(-1 if estoque is None else int(estoque))
+        self.vendidos.append(-1 if vendidos is None else int(vendidos))
+    
+    def descartar_blocos(self, quantidade):
+        """Remove os `quantidade` blocos mais antigos"""
+        pontos = quantidade * self.BLOCO
+        for coluna in (self.deltas, self.precos, self.estoques, self.vendidos):
+            del coluna[:pontos]
+        del self.marcos[:quantidade]
+    
+    def exportar(self):
+        colunas = ('marcos', 'deltas', 'precos', 'estoques', 'vendidos')
+        dados = {c: base64.b64encode(getattr(self, c).tobytes()).decode('ascii') for c in colunas}
+        dados['ultimo'] = self.ultimo
+        return dados
+    
+    @classmethod
+    def importar(cls, dados, byteorder):
+        serie = cls()
+        serie.ultimo = dados['ultimo']
+        for coluna in ('marcos', 'deltas', 'precos', 'estoques', 'vendidos'):
+            valores = getattr(serie, coluna)
+            valores.frombytes(base64.b64decode(dados[coluna]))
+            if byteorder != sys.byteorder:
+                valores.byteswap()
+        return serie
+    
+    def timestamps(self, inicio, fim):
+        """Decodifica os timestamps dos pontos [inicio, fim); `inicio` deve abrir um bloco"""
+        base = self.marcos[inicio // self.BLOCO]
+        return list(accumulate(self.deltas[inicio + 1:fim], initial=base))
+
+
+class SeriesPrecos:
+    """Séries temporais de todos os itens consultados"""
+    
+    def __init__(self, max_pontos, max_series=5000):
+        self._lock = threading.Lock()
+        self._series = OrderedDict()    # do item menos para o mais recentemente observado
+        self.max_pontos = max_pontos
+        self.max_series = max_series
+        self.versao = 0                 # muda a cada ponto; usado pelo snapshot
+    
+    def registrar(self, mlb_code, preco, estoque, vendidos, ts=None):
+        ts = int(time.time()) if ts is None else int(ts)
+        with self._lock:
+            self.versao += 1
+            serie = self._series.get(mlb_code)
+            if serie is None:
+                serie = self._series[mlb_code] = SerieTemporal()
+                # Lotes e pesquisas registram milhares de itens: mantém só os mais recentes
+                while len(self._series) > self.max_series:
+                    self._series.popitem(last=False)
+            else:
+                self._series.move_to_end(mlb_code)
+            serie.adicionar(ts, preco, estoque, vendidos)
+            
+            # Descarta blocos inteiros para não copiar os arrays a cada ponto
+            excesso = len(serie) - self.max_pontos
+            if excesso >= SerieTemporal.BLOCO:
+                serie.descartar_blocos(excesso // SerieTemporal.BLOCO)
+    
+    def total_pontos(self):
+        with self._lock:
+            return sum(len(s) for s in self._series.values())
+    
+    def exportar(self):
+        with self._lock:
+            return {
+                'byteorder': sys.byteorder,
+                'series': {codigo: serie.exportar() for codigo, serie in self._series.items()}
+            }
+    
+    def importar(self, dados):
+        # O snapshot preserva a ordem LRU; ficam as `max_series` mais recentes
+        codigos = list(dados['series'])[-self.max_series:]
+        series = OrderedDict(
+            (codigo, SerieTemporal.importar(dados['series'][codigo], dados['byteorder']))
+            for codigo in codigos
+        )
+        with self._lock:
+            self._series = series
+    
+    def consultar(self, mlb_code, de, ate, bucket):
+        """Retorna os pontos entre `de` e `ate` agregados em buckets de `bucket` segundos"""
+        with self._lock:
+            serie = self._series.get(mlb_code)
+            if serie is None:
+                return None
+            # Decodifica só os blocos do intervalo, começando no último bloco
+            # anterior a `de` para ter o ponto usado nas vendas do 1º bucket
+            bloco_inicial = max(bisect_left(serie.marcos, de) - 1, 0)
+            bloco_final = bisect_right(serie.marcos, ate)
+            inicio = bloco_inicial * SerieTemporal.BLOCO
+            fim = min(bloco_final * SerieTemporal.BLOCO, len(serie))
+            ts = serie.timestamps(inicio, fim)
+            
+            i = bisect_left(ts, de)
+            j = bisect_right(ts, ate)
+            k = max(i - 1, 0)
+            ts = ts[k:j]
+            precos = serie.precos[inicio + k:inicio + j]
+            estoques = serie.estoques[inicio + k:inicio + j]
+            vendidos = serie.vendidos[inicio + k:inicio + j]
+        
+        buckets = []
+        atual = None
+        vendidos_anterior = vendidos[0] if k < i and vendidos[0] >= 0 else None
+        vendas_total = 0
+        primeiro_ts = None
+        
+        for n in range(i - k, len(ts)):
+            inicio_bucket = ts[n] // bucket * bucket
+            if atual is None or atual['inicio'] != inicio_bucket:
+                atual = {
+                    'inicio': inicio_bucket,
+                    'pontos': 0,
+                    'preco_min': None,
+                    'preco_max': None,
+                    'preco_ultimo': None,
+                    'estoque_ultimo': None,
+                    'vendidos_ultimo': None,
+                    'vendas': 0
+                }
+                buckets.append(atual)
+            
+            atual['pontos'] += 1
+            if primeiro_ts is None:
+                primeiro_ts = ts[n]
+            
+            preco = precos[n]
+            if not math.isnan(preco):
+                atual['preco_min'] = preco if atual['preco_min'] is None else min(atual['preco_min'], preco)
+                atual['preco_max'] = preco if atual['preco_max'] is None else max(atual['preco_max'], preco)
+                atual['preco_ultimo'] = preco
+            if estoques[n] >= 0:
+                atual['estoque_ultimo'] = estoques[n]
+            if vendidos[n] >= 0:
+                atual['vendidos_ultimo'] = vendidos[n]
+                # Quedas em sold_quantity (ex.: relistagem) não contam como vendas
+                if vendidos_anterior is not None and vendidos[n] > vendidos_anterior:
+                    atual['vendas'] += vendidos[n] - vendidos_anterior
+                    vendas_total += vendidos[n] - vendidos_anterior
+                vendidos_anterior = vendidos[n]
+        
+        # As vendas incluem o delta a partir do ponto âncora (antes de `de`),
+        # então o período também precisa começar nele
+        if primeiro_ts is None:
+            dias = 0
+        else:
+            dias = (ts[-1] - (ts[0] if k < i else primeiro_ts)) / 86400
+        
+        return {
+            'pontos': sum(b['pontos'] for b in buckets),
+            'buckets': buckets,
+            'velocidade_vendas': {
+                'vendas': vendas_total,
+                'dias': round(dias, 4),
+                'vendas_por_dia': round(vendas_total / dias, 4) if dias > 0 else None
+            }
+        }
+
+class CacheTTL:
+    """Cache LRU em memória com expiração por tempo"""
+    
+    def __init__(self, ttl, max_itens):
+        self._lock = threading.Lock()
+        self._itens = OrderedDict()
+        self.ttl = ttl
+        self.max_itens = max_itens
+    
+    def __len__(self):
+        return len(self._itens)
+    
+    def obter(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return valor
+    
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+class ControleAdmissao:
+    """Limita taxa por cliente/rota e requisições simultâneas por classe de prioridade"""
+    
+    def __init__(self, max_simultaneas, max_fila, max_assinantes, espera_max, classes):
+        self._cond = threading.Condition()
+        self._baldes_lock = threading.Lock()
+        self._baldes = {}
+        self._ativas = 0
+        self._na_fila = 0
+        self.max_simultaneas = max_simultaneas
+        self.max_fila = max_fila
+        # Conexões SSE não passam pelas vagas, mas também prendem uma thread
+        self.max_assinantes = max_assinantes
+        self.espera_max = espera_max
+        # classe -> {'fracao': parte das vagas e da fila que pode ocupar, 'taxa': req/s, 'rajada': req}
+        self.classes = classes
+        self._fila_por_classe = {classe: 0 for classe in classes}
+    
+    def ajustar_a_threads(self, threads, reserva=2):
+        """Reduz vagas, fila e assinantes SSE para caberem em `threads`; retorna True se mudou"""
+        disponiveis = max(threads - reserva, 2)
+        total = self.max_simultaneas + self.max_fila + self.max_assinantes
+        if total <= disponiveis:
+            return False
+        
+        escala = disponiveis / total
+        with self._cond:
+            self.max_simultaneas = max(1, int(self.max_simultaneas * escala))
+            self.max_assinantes = max(1, int(self.max_assinantes * escala))
+            # A fila fica com o que sobrar
+            self.max_fila = max(0, disponiveis - self.max_simultaneas - self.max_assinantes)
+            self._cond.notify_all()
+        return True
+    
+    def verificar_taxa(self, chave, classe):
+        """Token bucket por chave; retorna 0 se liberado ou os segundos até a próxima vaga"""
+        taxa = self.classes[classe]['taxa']
+        rajada = self.classes[classe]['rajada']
+        agora = time.monotonic()
+        
+        with self._baldes_lock:
+            if len(self._baldes) > 10000:
+                # Descarta baldes cheios (clientes inativos)
+                self._baldes = {
+                    k: v for k, v in self._baldes.items()
+                    if v[0] + (agora - v[1]) * taxa < rajada
+                }
+            
+            fichas, ultimo = self._baldes.get(chave, (rajada, agora))
+            fichas = min(rajada, fichas + (agora - ultimo) * taxa)
+            
+            if fichas < 1:
+                self._baldes[chave] = (fichas, agora)
+                return (1 - fichas) / taxa
+            
+            self._baldes[chave] = (fichas - 1, agora)
+            return 0
+    
+    def entrar(self, classe):
+        """Ocupa uma vaga; retorna None se admitido ou os segundos sugeridos para Retry-After"""
+        fracao = self.classes[classe]['fracao']
+        
+        with self._cond:
+            limite = max(1, int(self.max_simultaneas * fracao))
+            if self._ativas < limite:
+                self._ativas += 1
+                return None
+            
+            # Quem espera na fila também prende uma thread: cada classe só
+            # ocupa a sua fração dela, para o bulk não esgotar as threads
+            limite_fila = max(1, int(self.max_fila * fracao))
+            if self._na_fila >= self.max_fila or self._fila_por_classe[classe] >= limite_fila:
+                return 1
+            
+            self._na_fila += 1
+            self._fila_por_classe[classe] += 1
+            prazo = time.monotonic() + self.espera_max
+            try:
+                while self._ativas >= limite:
+                    restante = prazo - time.monotonic()
+                    if restante <= 0:
+                        return self.espera_max
+                    self._cond.wait(restante)
+                self._ativas += 1
+                return None
+            finally:
+                self._na_fila -= 1
+                self._fila_por_classe[classe] -= 1
+    
+    def sair(self):
+        with self._cond:
+            self._ativas -= 1
+            # Classes têm limites diferentes: acorda todos para reavaliarem
+            self._cond.notify_all()
+
 # ========================================
 # INICIALIZAÇÃO
 # ========================================
 
 app = Flask(__name__)
 app.secret_key = FLASK_CONFIG['SECRET_KEY']
+# Render (e outros PaaS) ficam atrás de proxy: usa o IP real do cliente
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=FLASK_CONFIG.get('PROXIES_CONFIAVEIS', 1))
+
+historico = HistoricoBuscas(DATABASE_CONFIG['MAX_HISTORICO'])
+
+# Muda a cada boot; junto com o PID identifica de qual histórico vieram seq e ETag
+ID_INICIO = uuid.uuid4().hex[:8]
+
+
+def id_instancia():
+    """Identifica este processo (workers forkados com preload herdam ID_INICIO)"""
+    return f"{ID_INICIO}-{os.getpid()}"
+
+pool_credenciais = PoolCredenciais(carregar_credenciais(MERCADOLIVRE_CONFIG))
+
+# Sessão compartilhada: reaproveita conexões TLS com a API entre requisições
+sessao_http = requests.Session()
+sessao_http.mount('https://', HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=FLASK_CONFIG.get('MAX_SIMULTANEAS', 16)
+))
+series_precos = SeriesPrecos(
+    DATABASE_CONFIG.get('MAX_PONTOS_SERIE', 100000),
+    DATABASE_CONFIG.get('MAX_SERIES', 5000)
+)
+controle_admissao = ControleAdmissao(
+    FLASK_CONFIG.get('MAX_SIMULTANEAS', 16),
+    FLASK_CONFIG.get('MAX_FILA', 8),
+    FLASK_CONFIG.get('MAX_ASSINANTES_SSE', 8),
+    FLASK_CONFIG.get('ESPERA_MAX_FILA', 5),
+    {
+        'interativa': {
+            'fracao': 1.0,
+            'taxa': FLASK_CONFIG.get('TAXA_INTERATIVA', 5),
+            'rajada': FLASK_CONFIG.get('RAJADA_INTERATIVA', 20)
+        },
+        'bulk': {
+            'fracao': 0.5,
+            'taxa': FLASK_CONFIG.get('TAXA_BULK', 1),
+            'rajada': FLASK_CONFIG.get('RAJADA_BULK', 5)
+        }
+    }
+)
+cache_pesquisa = CacheTTL(
+    DATABASE_CONFIG.get('TTL_PESQUISA', 60),
+    DATABASE_CONFIG.get('MAX_CACHE_PESQUISA', 500)
+)
+# Páginas HTML dos visualizadores; a chave identifica a versão do item
+cache_paginas = CacheTTL(3600, DATABASE_CONFIG.get('MAX_CACHE_PAGINAS', 50))
+
+
+def calcular_versao_paginas():
+    """Versão dos templates e do código que os renderiza (mtime e tamanho dos arquivos)"""
+    pasta = os.path.join(app.root_path, app.template_folder)
+    arquivos = [os.path.abspath(__file__)] + sorted(
+        os.path.join(pasta, nome) for nome in os.listdir(pasta) if nome.endswith('.html')
+    )
+    assinatura = hashlib.blake2b(digest_size=8)
+    for arquivo in arquivos:
+        info = os.stat(arquivo)
+        assinatura.update(f"{arquivo}:{info.st_mtime_ns}:{info.st_size};".encode('utf-8'))
+    return assinatura.hexdigest()
 
-historico_buscas = []
-access_token = MERCADOLIVRE_CONFIG.get('ACCESS_TOKEN')
+
+# Entra na chave e no ETag das páginas: um deploy com template novo não
+# serve a página antiga do cache nem recebe 304 de um navegador
+VERSAO_PAGINAS = calcular_versao_paginas()
+
+# (fila, canal): canal None recebe o histórico; um id de lote recebe só o progresso dele
+assinantes_eventos = []
+assinantes_lock = threading.Lock()
 
 # ========================================
 # FUNÇÕES AUXILIARES
 # ========================================
 
-def obter_access_token():
-    """Obtém ou renova access token"""
-    global access_token
-    
-    if MERCADOLIVRE_CONFIG.get('ACCESS_TOKEN'):
-        access_token = MERCADOLIVRE_CONFIG['ACCESS_TOKEN']
+def solicitar_access_token(credencial, rejeitados=()):
+    """Solicita um novo access token à API do Mercado Livre para uma credencial"""
+    # Um ACCESS_TOKEN fixo que já foi recusado não é reaproveitado
+    if credencial.get('ACCESS_TOKEN') and credencial['ACCESS_TOKEN'] not in rejeitados:
         print("✅ Usando ACCESS_TOKEN configurado")
-        return access_token
+        return credencial['ACCESS_TOKEN']
     
-    if MERCADOLIVRE_CONFIG.get('REFRESH_TOKEN'):
+    if credencial.get('REFRESH_TOKEN'):
         try:
             response = requests.post(
                 f"{MERCADOLIVRE_CONFIG['API_BASE_URL']}/oauth/token",
                 data={
                     'grant_type': 'refresh_token',
-                    'client_id': MERCADOLIVRE_CONFIG['CLIENT_ID'],
-                    'client_secret': MERCADOLIVRE_CONFIG['CLIENT_SECRET'],
-                    'refresh_token': MERCADOLIVRE_CONFIG['REFRESH_TOKEN']
+                    'client_id': credencial.get('CLIENT_ID', ''),
+                    'client_secret': credencial.get('CLIENT_SECRET', ''),
+                    'refresh_token': credencial['REFRESH_TOKEN']
                 },
                 timeout=10
             )
@@ -86,14 +744,14 @@ def obter_access_token():
         except Exception as e:
             print(f"💥 Erro ao renovar token: {str(e)}")
     
-    if MERCADOLIVRE_CONFIG.get('CLIENT_ID') and MERCADOLIVRE_CONFIG.get('CLIENT_SECRET'):
+    if credencial.get('CLIENT_ID') and credencial.get('CLIENT_SECRET'):
         try:
             response = requests.post(
                 f"{MERCADOLIVRE_CONFIG['API_BASE_URL']}/oauth/token",
                 data={
                     'grant_type': 'client_credentials',
-                    'client_id': MERCADOLIVRE_CONFIG['CLIENT_ID'],
-                    'client_secret': MERCADOLIVRE_CONFIG['CLIENT_SECRET']
+                    'client_id': credencial['CLIENT_ID'],
+                    'client_secret': credencial['CLIENT_SECRET']
                 },
                 timeout=10
             )
@@ -110,8 +768,64 @@ def obter_access_token():
     return None
 
 
+# Prefixos de site do Mercado Livre / Mercado Libre
+SITES_MERCADOLIVRE = frozenset({
+    'MLA', 'MLB', 'MLM', 'MLC', 'MCO', 'MLU', 'MPE', 'MLV', 'MEC', 'MBO',
+    'MPY', 'MCR', 'MPA', 'MRD', 'MGT', 'MHN', 'MNI', 'MSV', 'MCU'
+})
+
+# Código de item solto ou em permalink (ex.: produto.mercadolivre.com.br/MLB-123456-...)
+PADRAO_CODIGO_ITEM = re.compile(r'(?<![A-Z0-9])(M[A-Z]{2})[-_ ]?(\d{6,15})(?!\d)')
+# URL de catálogo (/p/MLB...): o código é de produto, o item vem em item_id/wid
+PADRAO_URL_CATALOGO = re.compile(r'/P/M[A-Z]{2}\d{6,15}')
+PADRAO_ITEM_CATALOGO = re.compile(r'(?:ITEM_ID|WID)(?:=|:|%3A)(M[A-Z]{2})[-_]?(\d{6,15})(?!\d)')
+
+# Id de lote escolhido pelo cliente (para assinar /eventos?lote= antes do POST)
+PADRAO_ID_LOTE = re.compile(r'[A-Za-z0-9_-]{1,32}')
+
+
+def codigos_da_linha(linha):
+    """Retorna (códigos de item encontrados na linha, motivo se nenhum for válido)"""
+    texto = linha.upper()
+    
+    if '/P/' in texto and PADRAO_URL_CATALOGO.search(texto):
+        candidatos = PADRAO_ITEM_CATALOGO.findall(texto)
+        if not candidatos:
+            return [], 'URL de catálogo sem item_id'
+    else:
+        candidatos = PADRAO_CODIGO_ITEM.findall(texto)
+    
+    codigos = [site + numero for site, numero in candidatos if site in SITES_MERCADOLIVRE]
+    if codigos:
+        return codigos, None
+    return [], 'Prefixo de site desconhecido' if candidatos else 'Nenhum código encontrado'
+
+
+def extrair_codigos(linhas):
+    """Percorre as linhas e gera ('codigo', id) únicos na ordem ou ('invalida', detalhes)"""
+    vistos = set()
+    
+    for numero, linha in enumerate(linhas, 1):
+        linha = linha.strip()
+        if not linha:
+            continue
+        
+        codigos, motivo = codigos_da_linha(linha)
+        if motivo:
+            yield 'invalida', {'linha': numero, 'conteudo': linha[:200], 'error': motivo}
+            continue
+        
+        for codigo in codigos:
+            if codigo not in vistos:
+                vistos.add(codigo)
+                yield 'codigo', codigo
+
+
 def limpar_codigo_mlb(codigo):
-    """Remove caracteres inválidos do código MLB"""
+    """Extrai o código do item (aceita permalinks); senão remove caracteres inválidos"""
+    codigos, _ = codigos_da_linha(codigo)
+    if codigos:
+        return codigos[0]
     return codigo.replace('-', '').replace(' ', '').strip().upper()
 
 
@@ -158,34 +872,94 @@ def extrair_info_full(json_api):
     }
 
 
+def resposta_sem_cota(espera):
+    """429 local para quando as credenciais do pool estão esperando a cota voltar"""
+    print(f"⏳ Nenhuma credencial com cota disponível; próxima em {espera}s")
+    
+    response = requests.Response()
+    response.status_code = 429
+    response.headers['Retry-After'] = str(espera)
+    response.headers['Content-Type'] = 'application/json'
+    response._content = json.dumps({'message': 'Nenhuma credencial disponível'}).encode()
+    return response
+
+
+def requisitar_api(url, params=None):
+    """Faz um GET autenticado na API, escolhendo a credencial menos carregada do pool"""
+    tentadas = set()
+    ultimo_429 = None
+    
+    while True:
+        credencial = pool_credenciais.escolher(excluir=tentadas)
+        
+        if credencial is None:
+            # Cota esgotada (429 de verdade da API): não cai para o acesso
+            # anônimo, que tem um limite ainda menor
+            if ultimo_429 is not None:
+                return ultimo_429
+            espera = pool_credenciais.segundos_ate_cota()
+            if espera is not None:
+                return resposta_sem_cota(espera)
+            
+            # Nenhuma credencial configurada ou nenhum token obtido: segue sem
+            # autenticação, já que os itens são públicos
+            if len(pool_credenciais):
+                print("⚠️  Nenhum token válido - seguindo sem autenticação")
+            print("🔑 Sem autenticação")
+            response = sessao_http.get(url, params=params, timeout=10)
+            print(f"📊 Status Code: {response.status_code}")
+            return response
+        
+        tentadas.add(credencial)
+        try:
+            token = credencial.token or credencial.renovar()
+            if not token:
+                continue
+            
+            print(f"🔑 Usando autenticação ({credencial.nome})")
+            response = sessao_http.get(url, params=params, headers={'Authorization': f"Bearer {token}"}, timeout=10)
+            print(f"📊 Status Code: {response.status_code}")
+            
+            if response.status_code == 401:
+                print("🔄 Token expirado, renovando...")
+                token = credencial.renovar(token)
+                if not token:
+                    continue
+                response = sessao_http.get(url, params=params, headers={'Authorization': f"Bearer {token}"}, timeout=10)
+                print(f"📊 Novo Status Code: {response.status_code}")
+            
+            credencial.registrar_resposta(response)
+        finally:
+            pool_credenciais.liberar(credencial)
+        
+        # Cota esgotada nesta credencial: tenta a próxima
+        if response.status_code == 429 and len(tentadas) < len(pool_credenciais):
+            print(f"⏳ 429 em {credencial.nome}, tentando outra credencial...")
+            ultimo_429 = response
+            continue
+        
+        return response
+
+
 def buscar_produto_api(mlb_code):
     """Busca informações do produto na API do Mercado Livre"""
-    global access_token, historico_buscas
-    
     try:
         url = f"{MERCADOLIVRE_CONFIG['API_BASE_URL']}/items/{mlb_code}"
         print(f"🔍 Buscando: {url}")
         
-        if not access_token:
-            obter_access_token()
-        
-        headers = {'Authorization': f"Bearer {access_token}"} if access_token else {}
-        print(f"🔑 {'Usando' if access_token else 'Sem'} autenticação")
-        
-        response = requests.get(url, headers=headers, timeout=10)
-        print(f"📊 Status Code: {response.status_code}")
-        
-        if response.status_code == 401:
-            print("🔄 Token expirado, renovando...")
-            if obter_access_token():
-                headers = {'Authorization': f"Bearer {access_token}"}
-                response = requests.get(url, headers=headers, timeout=10)
-                print(f"📊 Novo Status Code: {response.status_code}")
+        response = requisitar_api(url)
         
         if response.status_code == 200:
             data = response.json()
             print(f"✅ Produto encontrado: {data.get('title', 'N/A')}")
             
+            series_precos.registrar(
+                data.get('id'),
+                data.get('price'),
+                data.get('available_quantity'),
+                data.get('sold_quantity')
+            )
+            
             produto = {
                 'id': data.get('id'),
                 'titulo': data.get('title'),
@@ -206,17 +980,13 @@ def buscar_produto_api(mlb_code):
                 'json_completo': data
             }
             
-            historico_buscas = [p for p in historico_buscas if p['id'] != produto['id']]
-            historico_buscas.insert(0, produto)
-            
-            if len(historico_buscas) > DATABASE_CONFIG['MAX_HISTORICO']:
-                historico_buscas.pop()
-            
-            return produto
+            return historico.adicionar(produto)
         
         codigos_erro = {
             404: 'Produto não encontrado',
-            403: 'Acesso negado - Verifique suas credenciais'
+            401: 'Falha de autenticação - não foi possível obter um token válido, verifique suas credenciais',
+            403: 'Acesso negado - Verifique suas credenciais',
+            429: 'Limite de requisições da API atingido - tente novamente em instantes'
         }
         
         if response.status_code in codigos_erro:
@@ -234,6 +1004,216 @@ def buscar_produto_api(mlb_code):
         return {'error': f'Erro inesperado: {str(e)}', 'codigo': mlb_code}
 
 
+# A API de pesquisa não pagina além dos primeiros 1000 resultados
+JANELA_PESQUISA = 1000
+
+
+def normalizar_filtros_pesquisa(args):
+    """Normaliza os filtros de pesquisa para que consultas equivalentes usem a mesma chave"""
+    return {
+        'q': ' '.join(args.get('q', '').lower().split()),
+        'categoria': args.get('categoria', '').strip().upper(),
+        'vendedor': args.get('vendedor', '').strip()
+    }
+
+
+def pesquisar_pagina(filtros, offset, limite):
+    """Busca uma página da pesquisa do site, usando o cache quando possível"""
+    chave = (filtros['q'], filtros['categoria'], filtros['vendedor'], offset, limite)
+    pagina = cache_pesquisa.obter(chave)
+    if pagina is not None:
+        return pagina
+    
+    params = {'offset': offset, 'limit': limite}
+    if filtros['q']:
+        params['q'] = filtros['q']
+    if filtros['categoria']:
+        params['category'] = filtros['categoria']
+    if filtros['vendedor']:
+        params['seller_id'] = filtros['vendedor']
+    
+    site_id = MERCADOLIVRE_CONFIG.get('SITE_ID', 'MLB')
+    
+    try:
+        url = f"{MERCADOLIVRE_CONFIG['API_BASE_URL']}/sites/{site_id}/search"
+        print(f"🔎 Pesquisando: {url} {params}")
+        response = requisitar_api(url, params)
+        
+        if response.status_code != 200:
+            return {'error': f'Erro na API: {response.status_code}'}
+        
+        data = response.json()
+        pagina = {
+            'total': data.get('paging', {}).get('total', 0),
+            'resultados': data.get('results', [])
+        }
+        cache_pesquisa.guardar(chave, pagina)
+        return pagina
+    
+    except requests.exceptions.Timeout:
+        return {'error': 'Tempo de requisição excedido'}
+    except requests.exceptions.RequestException as e:
+        return {'error': f'Erro de conexão: {str(e)}'}
+
+
+def resumo_resultado_pesquisa(item):
+    """Retorna os campos principais de um resultado da pesquisa"""
+    return {
+        'id': item.get('id'),
+        'titulo': item.get('title'),
+        'preco': item.get('price'),
+        'moeda': item.get('currency_id'),
+        'vendedor_id': item.get('seller', {}).get('id'),
+        'categoria': item.get('category_id'),
+        'link': item.get('permalink')
+    }
+
+
+def detalhar_itens(ids):
+    """Busca vários itens via multiget (/items?ids=) e classifica o Full de cada um"""
+    detalhes = []
+    
+    for i in range(0, len(ids), 20):
+        lote = ids[i:i + 20]
+        try:
+            response = requisitar_api(
+                f"{MERCADOLIVRE_CONFIG['API_BASE_URL']}/items",
+                {'ids': ','.join(lote)}
+            )
+        except requests.exceptions.RequestException as e:
+            detalhes.extend({'codigo': mlb_code, 'error': f'Erro de conexão: {str(e)}'} for mlb_code in lote)
+            continue
+        
+        if response.status_code != 200:
+            detalhes.extend({'codigo': mlb_code, 'error': f'Erro na API: {response.status_code}'} for mlb_code in lote)
+            continue
+        
+        try:
+            resultados = response.json()
+            if not isinstance(resultados, list):
+                raise ValueError('resposta do multiget não é uma lista')
+        except ValueError:
+            detalhes.extend({'codigo': mlb_code, 'error': 'Resposta inválida da API'} for mlb_code in lote)
+            continue
+        
+        for resultado, mlb_code in zip(resultados, lote):
+            data = resultado.get('body', {})
+            if resultado.get('code') != 200:
+                detalhes.append({'codigo': mlb_code, 'error': data.get('message', f"Erro na API: {resultado.get('code')}")})
+                continue
+            
+            # Não entra em series_precos: um lote de milhares de códigos
+            # expulsaria do LRU as séries dos itens buscados de fato
+            info_full = extrair_info_full(data)
+            detalhes.append({
+                'codigo': data.get('id'),
+                'titulo': data.get('title'),
+                'preco': data.get('price'),
+                'moeda': data.get('currency_id'),
+                'estoque': data.get('available_quantity'),
+                'vendidos': data.get('sold_quantity'),
+                'vendedor_id': data.get('seller_id'),
+                'link': data.get('permalink'),
+                'e_full': info_full['e_full'],
+                'tipo_full': info_full['tipo_full'],
+                'frete_gratis': info_full['frete_gratis']
+            })
+    
+    return detalhes
+
+
+def resumo_produto(produto):
+    """Retorna apenas os campos usados na listagem do histórico"""
+    return {
+        'seq': produto.get('seq'),
+        'id': produto.get('id'),
+        'titulo': produto.get('titulo'),
+        'preco': produto.get('preco'),
+        'moeda': produto.get('moeda'),
+        'data_busca': produto.get('data_busca')
+    }
+
+
+def publicar_evento(tipo, dados, evento_id=None, canal=None):
+    """Envia um evento aos clientes conectados em /eventos que assinam o canal"""
+    with assinantes_lock:
+        filas = [fila for fila, canal_fila in assinantes_eventos if canal_fila == canal]
+    
+    for fila in filas:
+        try:
+            fila.put_nowait((tipo, dados, evento_id))
+        except queue.Full:
+            # Cliente lento: descarta o acumulado e pede uma nova sincronização
+            try:
+                while True:
+                    fila.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                fila.put_nowait(('ressincronizar', {'versao': historico.seq}, None))
+            except queue.Full:
+                pass
+
+
+def formatar_evento_sse(tipo, dados, evento_id=None):
+    """Formata um evento no padrão Server-Sent Events"""
+    linhas = []
+    if evento_id is not None:
+        linhas.append(f"id: {evento_id}")
+    linhas.append(f"event: {tipo}")
+    linhas.append(f"data: {json.dumps(dados, ensure_ascii=False)}")
+    return '\n'.join(linhas) + '\n\n'
+
+
+def json_em_blocos(dados, tamanho=16384):
+    """Serializa o JSON formatado em blocos de ~`tamanho` caracteres"""
+    buffer = []
+    total = 0
+    for parte in json.JSONEncoder(indent=2, ensure_ascii=False).iterencode(dados):
+        buffer.append(parte)
+        total += len(parte)
+        if total >= tamanho:
+            yield ''.join(buffer)
+            buffer = []
+            total = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def versao_conteudo(dados):
+    """Hash curto do conteúdo de um item, usado como versão no cache de páginas
+    
+    Serializa o item inteiro a cada chamada: só vale onde o item acabou de
+    vir da API (o custo some perto da requisição); para itens do histórico,
+    a chave usa o `seq` da entrada.
+    """
+    serializado = json.dumps(dados, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(serializado.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def renderizar_em_cache(chave, template, **contexto):
+    """Renderiza o template em stream e guarda a página pronta para os próximos acessos"""
+    chave = (VERSAO_PAGINAS, chave)
+    pagina = cache_paginas.obter(chave)
+    
+    if pagina is not None:
+        response = Response(pagina, mimetype='text/html')
+    else:
+        partes_template = stream_template(template, **contexto)
+        
+        def gerar():
+            partes = []
+            for parte in partes_template:
+                partes.append(parte)
+                yield parte
+            cache_paginas.guardar(chave, ''.join(partes))
+        
+        response = Response(gerar(), mimetype='text/html')
+    
+    response.set_etag(hashlib.blake2b(repr(chave).encode('utf-8'), digest_size=12).hexdigest())
+    return response.make_conditional(request)
+
+
 def adicionar_cors(response):
     """Adiciona headers CORS à resposta"""
     response.headers.add('Access-Control-Allow-Origin', '*')
@@ -241,6 +1221,214 @@ def adicionar_cors(response):
     return response
 
 
+# ========================================
+# INÍCIO A QUENTE E SNAPSHOT
+# ========================================
+# Sob gunicorn, o __main__ não roda: os hooks de gunicorn.conf.py chamam
+# obter_tokens() no master (herdado pelos workers com --preload) e
+# preparar_inicio() / aquecer_conexoes() / salvar_snapshot() em cada worker.
+# O snapshot é lido sempre no worker: um worker que substitui outro precisa
+# do arquivo mais recente, não do estado do master no boot.
+
+snapshot_lock = threading.Lock()
+versao_snapshot = None
+
+
+def salvar_snapshot():
+    """Grava histórico e séries em disco, se algo mudou desde o último snapshot"""
+    global versao_snapshot
+    caminho = DATABASE_CONFIG.get('SNAPSHOT_PATH', 'snapshot.json')
+    if not caminho:
+        return False
+    
+    with snapshot_lock:
+        versao = [historico.seq, series_precos.versao]
+        if versao == versao_snapshot:
+            return False
+        
+        dados = {
+            'historico': historico.exportar(),
+            'series': series_precos.exportar()
+        }
+        
+        # Escreve em arquivo temporário e troca, para nunca deixar um snapshot pela metade
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        try:
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(dados, f, ensure_ascii=False)
+            os.replace(temporario, caminho)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"💥 Erro ao salvar snapshot: {str(e)}")
+            return False
+        
+        versao_snapshot = versao
+        print(f"💾 Snapshot salvo em {caminho}")
+        return True
+
+
+def carregar_snapshot():
+    """Restaura histórico e séries do último snapshot salvo"""
+    global versao_snapshot
+    caminho = DATABASE_CONFIG.get('SNAPSHOT_PATH', 'snapshot.json')
+    if not caminho or not os.path.exists(caminho):
+        return False
+    
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            dados = json.load(f)
+        historico.importar(dados['historico'])
+        series_precos.importar(dados['series'])
+    except (OSError, ValueError, KeyError) as e:
+        print(f"💥 Erro ao carregar snapshot: {str(e)}")
+        return False
+    
+    with snapshot_lock:
+        versao_snapshot = [historico.seq, series_precos.versao]
+    print(f"💾 Snapshot carregado: {len(historico.listar())} buscas, {series_precos.total_pontos()} pontos")
+    return True
+
+
+def verificar_snapshot_persistente():
+    """Avisa quando, no Render, o snapshot não está num disco persistente"""
+    caminho = DATABASE_CONFIG.get('SNAPSHOT_PATH', 'snapshot.json')
+    if not caminho or not os.getenv('RENDER'):
+        return True
+    
+    # O disco do Render é montado em mountPath; fora dele o arquivo some a cada deploy
+    diretorio = os.path.dirname(os.path.abspath(caminho))
+    while diretorio != os.path.dirname(diretorio):
+        if os.path.ismount(diretorio):
+            return True
+        diretorio = os.path.dirname(diretorio)
+    
+    print(f"⚠️  SNAPSHOT_PATH={caminho} não está num disco persistente - o snapshot será perdido a cada deploy")
+    return False
+
+
+def obter_tokens():
+    """Obtém os tokens que ainda faltam antes da primeira requisição"""
+    if pool_credenciais.renovar_todas():
+        print("🔑 Tokens obtidos na inicialização")
+
+
+def preparar_inicio():
+    """Carrega o snapshot e obtém os tokens; chamar uma vez em cada processo que atende requisições"""
+    verificar_snapshot_persistente()
+    carregar_snapshot()
+    obter_tokens()
+
+
+def ajustar_capacidade(threads):
+    """Garante que vagas, fila e SSE não ocupem mais threads do que o worker tem"""
+    if controle_admissao.ajustar_a_threads(threads):
+        print(
+            f"⚠️  MAX_SIMULTANEAS + MAX_FILA + MAX_ASSINANTES_SSE excede as {threads} threads do worker; "
+            f"usando {controle_admissao.max_simultaneas} vagas, fila de {controle_admissao.max_fila} "
+            f"e {controle_admissao.max_assinantes} conexões SSE"
+        )
+
+
+def aquecer_conexoes(quantidade=2):
+    """Abre conexões TLS com a API para a primeira requisição não pagar o handshake"""
+    url = MERCADOLIVRE_CONFIG['API_BASE_URL']
+    
+    def abrir():
+        try:
+            sessao_http.head(url, timeout=5)
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️  Falha ao aquecer conexão: {str(e)}")
+    
+    # Em paralelo, para deixar `quantidade` conexões abertas no pool
+    threads = [threading.Thread(target=abrir) for _ in range(quantidade)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def iniciar_snapshot_periodico():
+    """Salva o snapshot em segundo plano, para não perder tudo num crash"""
+    intervalo = DATABASE_CONFIG.get('INTERVALO_SNAPSHOT', 300)
+    if intervalo <= 0:
+        return
+    
+    def loop():
+        while True:
+            time.sleep(intervalo)
+            salvar_snapshot()
+    
+    threading.Thread(target=loop, daemon=True, name='snapshot').start()
+
+
+# ========================================
+# CONTROLE DE ADMISSÃO
+# ========================================
+
+# Rotas sem limite algum (monitoramento e arquivos estáticos)
+ROTAS_CRITICAS = {'health', 'static'}
+
+# Exportações e consultas em massa: menor taxa e no máximo metade das vagas
+ROTAS_BULK = {
+    'exportar_json', 'json_puro', 'json_raw', 'json_completo_tudo',
+    'json_simplificado', 'csv_completo', 'csv_atributos', 'csv_com_full',
+    'pesquisar_stream', 'processar_lote'
+}
+
+# Conexões longas: só limite de taxa, sem ocupar vaga durante o stream
+ROTAS_STREAM = {'eventos'}
+
+
+def classe_da_rota(endpoint):
+    """Retorna a classe de prioridade de um endpoint"""
+    if endpoint is None or endpoint in ROTAS_CRITICAS:
+        return 'critica'
+    if endpoint in ROTAS_BULK:
+        return 'bulk'
+    return 'interativa'
+
+
+def resposta_sobrecarga(status, retry_after, mensagem):
+    response = adicionar_cors(jsonify({'error': mensagem, 'retry_after': math.ceil(retry_after)}))
+    response.status_code = status
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response
+
+
+@app.before_request
+def admitir_requisicao():
+    classe = classe_da_rota(request.endpoint)
+    if classe == 'critica':
+        return None
+    
+    espera = controle_admissao.verificar_taxa((request.remote_addr, request.endpoint), classe)
+    if espera:
+        return resposta_sobrecarga(429, espera, 'Muitas requisições - tente novamente em instantes')
+    
+    if request.endpoint in ROTAS_STREAM:
+        return None
+    
+    retry_after = controle_admissao.entrar(classe)
+    if retry_after is not None:
+        return resposta_sobrecarga(503, retry_after, 'Servidor sobrecarregado - tente novamente em instantes')
+    
+    g.vaga_admissao = True
+
+
+@app.after_request
+def agendar_liberacao_vaga(response):
+    # Respostas em stream só liberam a vaga quando terminam de ser enviadas
+    if g.pop('vaga_admissao', False):
+        response.call_on_close(controle_admissao.sair)
+    return response
+
+
+@app.teardown_request
+def liberar_vaga(exc):
+    # after_request não roda quando a view levanta exceção
+    if g.pop('vaga_admissao', False):
+        controle_admissao.sair()
+
+
 # ========================================
 # ROTAS PRINCIPAIS
 # ========================================
@@ -258,8 +1446,13 @@ def buscar():
     if not mlb_code:
         return jsonify({'error': 'Código MLB não fornecido'}), 400
     
-    mlb_code_limpo = limpar_codigo_mlb(mlb_code)
-    produto = buscar_produto_api(mlb_code_limpo)
+    # Mesma extração do /lote: URL de catálogo sem item_id ou prefixo
+    # desconhecido não chegam à API
+    codigos, motivo = codigos_da_linha(mlb_code)
+    if motivo:
+        return jsonify({'error': motivo, 'codigo': mlb_code}), 400
+    
+    produto = buscar_produto_api(codigos[0])
     
     if 'error' in produto:
         return jsonify(produto), 400
@@ -268,20 +1461,90 @@ def buscar():
 
 
 @app.route('/historico')
-def historico():
-    return jsonify(historico_buscas)
+def listar_historico():
+    return jsonify(historico.listar())
+
+
+@app.route('/historico/resumo')
+def historico_resumo():
+    """Retorna o histórico resumido, apenas com o que mudou desde `since`"""
+    since = request.args.get('since', default=0, type=int)
+    instancia = id_instancia()
+    
+    # Cursor emitido por outro worker ou antes de um restart não vale aqui
+    if request.args.get('instancia', instancia) != instancia:
+        since = 0
+    
+    versao, completo, itens = historico.desde(since)
+    
+    response = jsonify({
+        'versao': versao,
+        'instancia': instancia,
+        'completo': completo,
+        'max': historico.max_itens,
+        'itens': [resumo_produto(p) for p in itens]
+    })
+    response.set_etag(f"{instancia}-{versao}-{since}")
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+@app.route('/eventos')
+def eventos():
+    """Stream SSE com novas entradas do histórico ou, com ?lote=<id>, o progresso de um lote"""
+    ultimo_id = request.headers.get('Last-Event-ID', type=int)
+    canal = request.args.get('lote')
+    if canal is not None and not PADRAO_ID_LOTE.fullmatch(canal):
+        return adicionar_cors(jsonify({'error': 'Id de lote inválido'})), 400
+    
+    fila = queue.Queue(maxsize=100)
+    assinatura = (fila, canal)
+    
+    with assinantes_lock:
+        if len(assinantes_eventos) >= controle_admissao.max_assinantes:
+            return resposta_sobrecarga(503, 30, 'Limite de conexões de eventos atingido')
+        assinantes_eventos.append(assinatura)
+    
+    def gerar():
+        try:
+            yield 'retry: 3000\n\n'
+            
+            # Reconexão: reenvia o que foi perdido enquanto o cliente estava fora
+            if ultimo_id is not None and canal is None:
+                versao, completo, perdidos = historico.desde(ultimo_id)
+                if completo:
+                    yield formatar_evento_sse('ressincronizar', {'versao': versao})
+                else:
+                    for produto in reversed(perdidos):
+                        yield formatar_evento_sse('historico', resumo_produto(produto), produto['seq'])
+            
+            while True:
+                try:
+                    tipo, dados, evento_id = fila.get(timeout=15)
+                except queue.Empty:
+                    yield ': ping\n\n'
+                    continue
+                yield formatar_evento_sse(tipo, dados, evento_id)
+        finally:
+            with assinantes_lock:
+                if assinatura in assinantes_eventos:
+                    assinantes_eventos.remove(assinatura)
+    
+    return Response(gerar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 
 @app.route('/limpar-historico', methods=['POST'])
 def limpar_historico():
-    global historico_buscas
-    historico_buscas = []
+    historico.limpar()
     return jsonify({'success': True, 'message': 'Histórico limpo com sucesso'})
 
 
 @app.route('/exportar-json/<mlb_code>')
 def exportar_json(mlb_code):
-    produto = next((p for p in historico_buscas if p['id'] == mlb_code), None)
+    produto = historico.buscar(mlb_code)
     
     if not produto:
         return jsonify({'error': 'Produto não encontrado no histórico'}), 404
@@ -301,101 +1564,25 @@ def exportar_json(mlb_code):
 
 @app.route('/visualizar-json/<mlb_code>')
 def visualizar_json(mlb_code):
-    produto = next((p for p in historico_buscas if p['id'] == mlb_code), None)
+    # ?leve=1: página mínima que carrega o JSON de /json-raw no navegador
+    if request.args.get('leve') == '1':
+        return renderizar_em_cache(
+            ('visualizar_json.html', mlb_code, 'leve'),
+            'visualizar_json.html', mlb_code=mlb_code, json_blocos=None
+        )
+    
+    produto = historico.buscar(mlb_code)
     
     if not produto:
         return jsonify({'error': 'Produto não encontrado no histórico'}), 404
     
     json_completo = produto.get('json_completo', produto)
     
-    return f"""
-    <!DOCTYPE html>
-    <html lang="pt-BR">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>JSON - {mlb_code}</title>
-        <style>
-            body {{
-                font-family: 'Courier New', monospace;
-                background: #1e1e1e;
-                color: #d4d4d4;
-                padding: 20px;
-                margin: 0;
-            }}
-            .container {{
-                max-width: 1200px;
-                margin: 0 auto;
-                background: #252526;
-                padding: 20px;
-                border-radius: 8px;
-                box-shadow: 0 4px 6px rgba(0,0,0,0.3);
-            }}
-            h1 {{
-                color: #4ec9b0;
-                margin-top: 0;
-            }}
-            pre {{
-                background: #1e1e1e;
-                padding: 20px;
-                border-radius: 4px;
-                overflow-x: auto;
-                border: 1px solid #3c3c3c;
-            }}
-            .buttons {{
-                margin-bottom: 20px;
-            }}
-            button {{
-                background: #0e639c;
-                color: white;
-                border: none;
-                padding: 10px 20px;
-                border-radius: 4px;
-                cursor: pointer;
-                font-size: 14px;
-                margin-right: 10px;
-            }}
-            button:hover {{
-                background: #1177bb;
-            }}
-            .copied {{
-                display: inline-block;
-                margin-left: 10px;
-                color: #4ec9b0;
-                font-weight: bold;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>📄 JSON Completo - {mlb_code}</h1>
-            <div class="buttons">
-                <button onclick="copiarJSON()">📋 Copiar JSON</button>
-                <button onclick="baixarJSON()">💾 Baixar JSON</button>
-                <span id="copiado" class="copied" style="display:none;">✅ Copiado!</span>
-            </div>
-            <pre id="json-content">{json.dumps(json_completo, indent=2, ensure_ascii=False)}</pre>
-        </div>
-        
-        <script>
-            function copiarJSON() {{
-                const jsonText = document.getElementById('json-content').textContent;
-                navigator.clipboard.writeText(jsonText).then(() => {{
-                    const copiado = document.getElementById('copiado');
-                    copiado.style.display = 'inline-block';
-                    setTimeout(() => {{
-                        copiado.style.display = 'none';
-                    }}, 2000);
-                }});
-            }}
-            
-            function baixarJSON() {{
-                window.location.href = '/exportar-json/{mlb_code}';
-            }}
-        </script>
-    </body>
-    </html>
-    """
+    # Entradas do histórico não mudam: o seq (único nesta instância) basta como versão
+    return renderizar_em_cache(
+        ('visualizar_json.html', mlb_code, id_instancia(), produto['seq']),
+        'visualizar_json.html', mlb_code=mlb_code, json_blocos=json_em_blocos(json_completo)
+    )
 
 
 @app.route('/config-status')
@@ -406,7 +1593,8 @@ def config_status():
         'access_token_configurado': bool(MERCADOLIVRE_CONFIG.get('ACCESS_TOKEN')),
         'refresh_token_configurado': bool(MERCADOLIVRE_CONFIG.get('REFRESH_TOKEN')),
         'api_url': MERCADOLIVRE_CONFIG['API_BASE_URL'],
-        'tem_access_token': bool(access_token)
+        'tem_access_token': any(c.token for c in pool_credenciais.credenciais),
+        'credenciais': pool_credenciais.estado()
     })
 
 
@@ -769,52 +1957,215 @@ def json_simplificado(mlb_code):
 def exibir_json(mlb_code):
     """Busca e exibe o JSON de um produto diretamente pela URL"""
     mlb_code_limpo = limpar_codigo_mlb(mlb_code)
+    
+    # ?leve=1: página mínima que carrega o JSON de /json-raw no navegador
+    if request.args.get('leve') == '1':
+        return renderizar_em_cache(
+            ('exibir_json.html', mlb_code_limpo, 'leve'),
+            'exibir_json.html', mlb_code=mlb_code_limpo, titulo=None, json_blocos=None
+        )
+    
     produto = buscar_produto_api(mlb_code_limpo)
     
     if 'error' in produto:
-        return f"""
-        <!DOCTYPE html>
-        <html lang="pt-BR">
-        <head>
-            <meta charset="UTF-8">
-            <title>❌ Erro - {mlb_code_limpo}</title>
-            <style>
-                body {{ font-family: Arial; background: #f44336; color: white; text-align: center; padding: 50px; }}
-                h1 {{ font-size: 48px; }}
-            </style>
-        </head>
-        <body>
-            <h1>❌ Produto não encontrado</h1>
-            <p>{produto['error']}</p>
-            <p>Código: {mlb_code_limpo}</p>
-            <a href="/" style="color: white;">Voltar</a>
-        </body>
-        </html>
-        """
+        return render_template('erro_produto.html', mlb_code=mlb_code_limpo, erro=produto['error'])
     
     json_completo = produto.get('json_completo', produto)
     
-    return f"""
-    <!DOCTYPE html>
-    <html lang="pt-BR">
-    <head>
-        <meta charset="UTF-8">
-        <title>📦 {produto['titulo'][:50]}</title>
-        <style>
-            body {{ font-family: Arial; background: #1e1e1e; color: #d4d4d4; padding: 20px; }}
-            pre {{ background: #252526; padding: 20px; border-radius: 8px; overflow-x: auto; }}
-            button {{ background: #0e639c; color: white; border: none; padding: 10px 20px; border-radius: 4px; cursor: pointer; margin: 10px 5px; }}
-            button:hover {{ background: #1177bb; }}
-        </style>
-    </head>
-    <body>
-        <h1>📦 {produto['titulo']}</h1>
-        <button onclick="navigator.clipboard.writeText(document.getElementById('json').textContent)">📋 Copiar</button>
-        <button onclick="window.location.href='/exportar-json/{mlb_code_limpo}'">💾 Baixar</button>
-        <pre id="json">{json.dumps(json_completo, indent=2, ensure_ascii=False)}</pre>
-    </body>
-    </html>
-    """
+    return renderizar_em_cache(
+        ('exibir_json.html', mlb_code_limpo, versao_conteudo(json_completo)),
+        'exibir_json.html',
+        mlb_code=mlb_code_limpo,
+        titulo=produto['titulo'],
+        json_blocos=json_em_blocos(json_completo)
+    )
+
+
+# ========================================
+# ROTAS DE PESQUISA
+# ========================================
+
+@app.route('/pesquisar')
+def pesquisar():
+    """Retorna uma página da pesquisa do site, com cursor para a próxima"""
+    filtros = normalizar_filtros_pesquisa(request.args)
+    
+    if not any(filtros.values()):
+        return adicionar_cors(jsonify({'error': 'Informe q, categoria ou vendedor'})), 400
+    
+    offset = max(request.args.get('cursor', default=0, type=int), 0)
+    if offset >= JANELA_PESQUISA:
+        return adicionar_cors(jsonify({'error': f'A pesquisa só alcança os primeiros {JANELA_PESQUISA} resultados'})), 400
+    
+    limite = min(max(request.args.get('limite', default=50, type=int), 1), 50, JANELA_PESQUISA - offset)
+    
+    pagina = pesquisar_pagina(filtros, offset, limite)
+    
+    if 'error' in pagina:
+        return adicionar_cors(jsonify(pagina)), 502
+    
+    resultados = pagina['resultados']
+    proximo = offset + len(resultados)
+    
+    if request.args.get('detalhes') == '1':
+        itens = detalhar_itens([r['id'] for r in resultados])
+    else:
+        itens = [resumo_resultado_pesquisa(r) for r in resultados]
+    
+    return adicionar_cors(jsonify({
+        'filtros': filtros,
+        'total': pagina['total'],
+        'itens': itens,
+        'proximo_cursor': (
+            str(proximo)
+            if resultados and proximo < min(pagina['total'], JANELA_PESQUISA)
+            else None
+        )
+    }))
+
+
+@app.route('/pesquisar/stream')
+def pesquisar_stream():
+    """Percorre todas as páginas da pesquisa e envia os itens como NDJSON"""
+    filtros = normalizar_filtros_pesquisa(request.args)
+    
+    if not any(filtros.values()):
+        return adicionar_cors(jsonify({'error': 'Informe q, categoria ou vendedor'})), 400
+    
+    offset = max(request.args.get('cursor', default=0, type=int), 0)
+    if offset >= JANELA_PESQUISA:
+        return adicionar_cors(jsonify({'error': f'A pesquisa só alcança os primeiros {JANELA_PESQUISA} resultados'})), 400
+    
+    maximo = min(max(request.args.get('max', default=200, type=int), 1), JANELA_PESQUISA - offset)
+    detalhes = request.args.get('detalhes') == '1'
+    
+    def gerar():
+        nonlocal offset
+        enviados = 0
+        
+        while enviados < maximo:
+            pagina = pesquisar_pagina(filtros, offset, min(50, maximo - enviados))
+            
+            if 'error' in pagina:
+                yield json.dumps(pagina, ensure_ascii=False) + '\n'
+                return
+            
+            resultados = pagina['resultados']
+            if not resultados:
+                return
+            
+            if detalhes:
+                itens = detalhar_itens([r['id'] for r in resultados])
+            else:
+                itens = [resumo_resultado_pesquisa(r) for r in resultados]
+            
+            yield ''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in itens)
+            
+            enviados += len(resultados)
+            offset += len(resultados)
+            if offset >= pagina['total']:
+                return
+    
+    return adicionar_cors(Response(gerar(), mimetype='application/x-ndjson'))
+
+
+# ========================================
+# ROTAS DE LOTE
+# ========================================
+
+def linhas_da_requisicao():
+    """Retorna as linhas enviadas (arquivo, campo `texto` ou corpo) sem carregar tudo na memória"""
+    if 'arquivo' in request.files:
+        return io.TextIOWrapper(request.files['arquivo'].stream, encoding='utf-8', errors='replace')
+    if 'texto' in request.form:
+        return io.StringIO(request.form['texto'])
+    return io.TextIOWrapper(io.BufferedReader(request.stream), encoding='utf-8', errors='replace')
+
+
+@app.route('/lote', methods=['POST'])
+def processar_lote():
+    """Extrai códigos de texto, URLs ou arquivo (CSV/TXT) e busca os itens em lotes (NDJSON)"""
+    buscar_itens = request.args.get('buscar', '1') != '0'
+    # O progresso vai só para /eventos?lote=<id>; o cliente pode escolher o id
+    # para assinar antes de enviar, ou lê-lo do header X-Lote-Id
+    lote_id = request.args.get('lote', '')
+    if not PADRAO_ID_LOTE.fullmatch(lote_id):
+        lote_id = uuid.uuid4().hex[:8]
+    linhas = linhas_da_requisicao()
+    
+    def gerar():
+        contagem = {'lote': lote_id, 'codigos': 0, 'invalidas': 0, 'processados': 0}
+        saida = []
+        pendentes = []
+        
+        def buscar_pendentes():
+            itens = detalhar_itens(pendentes)
+            saida.extend(json.dumps(item, ensure_ascii=False) for item in itens)
+            contagem['processados'] += len(pendentes)
+            pendentes.clear()
+            publicar_evento('lote', dict(contagem, concluido=False), canal=lote_id)
+        
+        for tipo, valor in extrair_codigos(linhas):
+            if tipo == 'invalida':
+                contagem['invalidas'] += 1
+                saida.append(json.dumps(valor, ensure_ascii=False))
+            else:
+                contagem['codigos'] += 1
+                if buscar_itens:
+                    pendentes.append(valor)
+                    if len(pendentes) == 20:
+                        buscar_pendentes()
+                else:
+                    # Códigos só têm letras e dígitos: dispensa o json.dumps
+                    saida.append(f'{{"codigo": "{valor}"}}')
+            
+            # Envia em blocos para não fazer uma escrita por linha
+            if len(saida) >= 1000 or (buscar_itens and saida and not pendentes):
+                yield '\n'.join(saida) + '\n'
+                saida.clear()
+        
+        if pendentes:
+            buscar_pendentes()
+        if saida:
+            yield '\n'.join(saida) + '\n'
+        
+        publicar_evento('lote', dict(contagem, concluido=True), canal=lote_id)
+        yield json.dumps({'resumo': contagem}) + '\n'
+    
+    response = Response(stream_with_context(gerar()), mimetype='application/x-ndjson')
+    response.headers['X-Lote-Id'] = lote_id
+    return adicionar_cors(response)
+
+
+# ========================================
+# ROTAS DE SÉRIES TEMPORAIS
+# ========================================
+
+@app.route('/serie/<mlb_code>')
+def serie_temporal(mlb_code):
+    """Retorna o histórico de preço, estoque e vendas agregado por período"""
+    mlb_code_limpo = limpar_codigo_mlb(mlb_code)
+    
+    agora = int(time.time())
+    de = request.args.get('de', default=0, type=int)
+    ate = request.args.get('ate', default=agora, type=int)
+    bucket = request.args.get('bucket', default=3600, type=int)
+    
+    if bucket < 1 or de > ate:
+        return adicionar_cors(jsonify({'error': 'Parâmetros inválidos', 'codigo': mlb_code_limpo})), 400
+    
+    resultado = series_precos.consultar(mlb_code_limpo, de, ate, bucket)
+    
+    if resultado is None:
+        return adicionar_cors(jsonify({'error': 'Nenhuma observação registrada para este produto', 'codigo': mlb_code_limpo})), 404
+    
+    return adicionar_cors(jsonify({
+        'codigo': mlb_code_limpo,
+        'de': de,
+        'ate': ate,
+        'bucket': bucket,
+        **resultado
+    }))
 
 
 # ========================================
@@ -835,13 +2186,15 @@ if __name__ == '__main__':
     print(f"   CLIENT_SECRET: {'✅' if MERCADOLIVRE_CONFIG.get('CLIENT_SECRET') else '❌'}")
     print(f"   ACCESS_TOKEN: {'✅' if MERCADOLIVRE_CONFIG.get('ACCESS_TOKEN') else '❌'}")
     print(f"   REFRESH_TOKEN: {'✅' if MERCADOLIVRE_CONFIG.get('REFRESH_TOKEN') else '❌'}")
+    print(f"   CREDENCIAIS NO POOL: {len(pool_credenciais)}")
     print("=" * 60)
     
-    if access_token:
+    if all(c.token for c in pool_credenciais.credenciais):
         print("✅ Access token carregado!")
     else:
         print("🔑 Tentando obter access token...")
-        obter_access_token()
+    
+    preparar_inicio()
     
     print("=" * 60)
     print("🚚 ROTAS MERCADO ENVIOS FULL ATIVADAS:")
@@ -852,6 +2205,10 @@ if __name__ == '__main__':
     print("⚠️  Pressione CTRL+C para parar o servidor")
     print("=" * 60)
     
+    aquecer_conexoes()
+    iniciar_snapshot_periodico()
+    atexit.register(salvar_snapshot)
+    
     app.run(
         debug=FLASK_CONFIG['DEBUG'],
         host=FLASK_CONFIG['HOST'],
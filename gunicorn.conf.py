@@ -0,0 +1,85 @@
+import os
+
+# ========================================
+# CONFIGURAÇÃO DO GUNICORN
+# ========================================
+# A aplicação passa quase todo o tempo esperando a API do Mercado Livre
+# (timeout de 10s por chamada) e mantém conexões SSE abertas em /eventos.
+# Por isso usamos poucos processos com muitas threads (ou greenlets).
+#
+# O histórico fica em memória por processo: com mais de um worker cada
+# processo tem o seu. O padrão é 1 worker para manter histórico e eventos
+# consistentes; aumente WEB_CONCURRENCY só se isso não for um problema.
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# gthread (padrão) ou gevent (requer `pip install gevent`)
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+
+if worker_class == 'gevent':
+    # Com preload a aplicação é importada antes do worker aplicar o patch;
+    # aplicamos aqui para os locks da aplicação já nascerem cooperativos
+    from gevent import monkey
+    monkey.patch_all()
+
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+
+# Threads por worker (gthread). Cada requisição em andamento, cada uma
+# esperando na fila de admissão e cada conexão SSE aberta prende uma thread;
+# a reserva mantém /health respondendo mesmo com todas ocupadas. Se
+# GUNICORN_THREADS for menor que a soma, post_fork reduz os limites da app.
+threads = int(os.getenv('GUNICORN_THREADS', (
+    int(os.getenv('MAX_SIMULTANEAS', 16)) +
+    int(os.getenv('MAX_FILA', 8)) +
+    int(os.getenv('MAX_ASSINANTES_SSE', 8)) +
+    2
+)))
+
+# Conexões simultâneas por worker (gevent)
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Uma busca pode fazer até 2 chamadas de 10s (401 + nova tentativa) e a
+# renovação do token mais uma. Os workers gthread/gevent continuam enviando
+# heartbeat durante streams SSE longos, então o timeout não os derruba.
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 45))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+accesslog = '-'
+errorlog = '-'
+
+# Carrega a aplicação no master antes do fork: os tokens obtidos em
+# when_ready são herdados por todos os workers
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+# ========================================
+# HOOKS DE INICIALIZAÇÃO E DESLIGAMENTO
+# ========================================
+
+def when_ready(server):
+    # Só no master com preload, e só os tokens: o snapshot é lido em cada
+    # worker, senão um worker reposto herdaria o estado do boot e o
+    # gravaria por cima do snapshot mais novo
+    if server.cfg.preload_app:
+        import app
+        app.obter_tokens()
+
+
+def post_fork(server, worker):
+    import app
+    if 'gevent' not in server.cfg.worker_class_str:
+        app.ajustar_capacidade(server.cfg.threads)
+    app.preparar_inicio()
+    # Conexões são abertas depois do fork para não serem compartilhadas entre processos
+    app.aquecer_conexoes()
+    app.iniciar_snapshot_periodico()
+
+
+def worker_exit(server, worker):
+    # O gunicorn também chama este hook no master ao recolher um worker;
+    # só o próprio worker tem o estado atualizado para salvar
+    if os.getpid() != worker.pid:
+        return
+    import app
+    app.salvar_snapshot()
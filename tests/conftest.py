@@ -0,0 +1,88 @@
+import os
+import sys
+
+import pytest
+
+# Permite `import app` rodando o pytest de qualquer diretório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+class RespostaFalsa:
+    """Resposta mínima no formato de requests.Response; `dados=None` simula corpo inválido"""
+
+    def __init__(self, status_code=200, dados=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._dados = dados
+
+    def json(self):
+        if self._dados is None:
+            raise ValueError('corpo não é JSON')
+        return self._dados
+
+
+def item_falso(mlb_code):
+    return {
+        'id': mlb_code,
+        'title': f'Produto {mlb_code}',
+        'price': 10.0,
+        'currency_id': 'BRL',
+        'available_quantity': 5,
+        'sold_quantity': 3,
+        'pictures': [],
+        'attributes': []
+    }
+
+
+# Tokens que simulam uma credencial recusada (401) ou com a cota esgotada (429)
+TOKEN_RECUSADO = 'recusado'
+TOKEN_ESGOTADO = 'esgotado'
+
+
+def get_falso(url, params=None, headers=None, timeout=None):
+    """Simula a API: item, multiget (/items?ids=) e pesquisa do site"""
+    token = (headers or {}).get('Authorization')
+    if token == f'Bearer {TOKEN_RECUSADO}':
+        return RespostaFalsa(401, {'message': 'invalid token'})
+    if token == f'Bearer {TOKEN_ESGOTADO}':
+        return RespostaFalsa(429, {'message': 'too many requests'}, {'Retry-After': '30'})
+
+    if url.endswith('/search'):
+        offset, limite = params['offset'], params['limit']
+        return RespostaFalsa(200, {
+            'paging': {'total': 5000},
+            'results': [item_falso(f'MLB{1000000 + i}') for i in range(offset, offset + limite)]
+        })
+
+    if url.endswith('/items'):
+        return RespostaFalsa(200, [
+            {'code': 200, 'body': item_falso(mlb_code)}
+            for mlb_code in params['ids'].split(',')
+        ])
+
+    return RespostaFalsa(200, item_falso(url.rsplit('/', 1)[-1]))
+
+
+@pytest.fixture
+def api_falsa(monkeypatch):
+    """Troca a sessão HTTP pela API simulada, sem credenciais; retorna as chamadas feitas"""
+    chamadas = []
+
+    def get(url, params=None, headers=None, timeout=None):
+        chamadas.append({'url': url, 'params': params, 'headers': headers})
+        return get_falso(url, params, headers, timeout)
+
+    monkeypatch.setattr(app.sessao_http, 'get', get)
+    monkeypatch.setattr(app.pool_credenciais, 'credenciais', [])
+    return chamadas
+
+
+@pytest.fixture
+def sem_limite_de_taxa(monkeypatch):
+    """Os testes fazem muitas requisições do mesmo endereço em sequência"""
+    monkeypatch.setattr(app, 'controle_admissao', app.ControleAdmissao(16, 8, 8, 1, {
+        'interativa': {'fracao': 1.0, 'taxa': 1000, 'rajada': 1000},
+        'bulk': {'fracao': 0.5, 'taxa': 1000, 'rajada': 1000}
+    }))
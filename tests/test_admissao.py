@@ -0,0 +1,46 @@
+import threading
+import time
+
+import app
+
+
+def criar_controle(max_simultaneas=4, max_fila=4, max_assinantes=2, espera_max=1):
+    return app.ControleAdmissao(max_simultaneas, max_fila, max_assinantes, espera_max, {
+        'interativa': {'fracao': 1.0, 'taxa': 100, 'rajada': 100},
+        'bulk': {'fracao': 0.5, 'taxa': 100, 'rajada': 100}
+    })
+
+
+def test_limites_cabem_nas_threads_do_worker():
+    controle = criar_controle(max_simultaneas=16, max_fila=8, max_assinantes=8)
+
+    assert controle.ajustar_a_threads(12)
+    total = controle.max_simultaneas + controle.max_fila + controle.max_assinantes
+    assert total <= 12 - 2
+    assert controle.max_simultaneas >= 1 and controle.max_assinantes >= 1
+
+    # Já cabe: nada muda
+    assert not controle.ajustar_a_threads(100)
+
+
+def test_bulk_so_ocupa_sua_fracao_da_fila():
+    controle = criar_controle(max_simultaneas=2, max_fila=4, espera_max=0.5)
+    # Bulk usa 1 das 2 vagas e só 2 das 4 posições da fila
+    assert controle.entrar('bulk') is None
+
+    resultados = []
+    threads = [
+        threading.Thread(target=lambda: resultados.append(controle.entrar('bulk')))
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+
+    assert controle.entrar('bulk') == 1
+    # A parte da fila reservada à interativa continua livre
+    assert controle.entrar('interativa') is None
+
+    for thread in threads:
+        thread.join()
+    assert resultados == [controle.espera_max, controle.espera_max]
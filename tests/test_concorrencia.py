@@ -0,0 +1,65 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def historico_isolado(monkeypatch, api_falsa):
+    monkeypatch.setattr(app, 'historico', app.HistoricoBuscas(50))
+    monkeypatch.setattr(app, 'series_precos', app.SeriesPrecos(1000))
+    return app.historico
+
+
+def verificar_integridade(historico):
+    itens = historico.listar()
+    ids = [p['id'] for p in itens]
+    seqs = [p['seq'] for p in itens]
+
+    assert len(ids) == len(set(ids))
+    assert len(itens) <= historico.max_itens
+    assert all(a > b for a, b in zip(seqs, seqs[1:]))
+    assert all(p['json_completo']['id'] == p['id'] for p in itens)
+    return itens
+
+
+def test_buscas_paralelas_nao_perdem_nem_corrompem_historico(historico_isolado, capsys):
+    codigos = [f'MLB{1000000 + i}' for i in range(200)]
+    buscados = set()
+    buscados_lock = threading.Lock()
+
+    def buscar(_):
+        mlb_code = random.choice(codigos)
+        produto = app.buscar_produto_api(mlb_code)
+        assert 'error' not in produto
+        with buscados_lock:
+            buscados.add(mlb_code)
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        list(executor.map(buscar, range(5000)))
+
+    itens = verificar_integridade(historico_isolado)
+    assert len(itens) == min(len(buscados), historico_isolado.max_itens)
+    assert historico_isolado.seq == 5000
+    assert itens[0]['seq'] == historico_isolado.seq
+
+
+def test_limpezas_concorrentes_mantem_historico_consistente(historico_isolado, capsys):
+    def trabalhar(i):
+        if i % 50 == 0:
+            historico_isolado.limpar()
+        else:
+            app.buscar_produto_api(f'MLB{1000000 + i % 120}')
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        list(executor.map(trabalhar, range(5000)))
+
+    itens = verificar_integridade(historico_isolado)
+    # Nada anterior à última limpeza pode sobreviver
+    assert all(p['seq'] > historico_isolado.reset_seq for p in itens)
+    versao, completo, desde_limpeza = historico_isolado.desde(historico_isolado.reset_seq)
+    assert not completo
+    assert [p['id'] for p in desde_limpeza] == [p['id'] for p in itens]
@@ -0,0 +1,86 @@
+import pytest
+
+import app
+from conftest import TOKEN_ESGOTADO, TOKEN_RECUSADO, RespostaFalsa
+
+
+def tokens_usados(chamadas):
+    return [(c['headers'] or {}).get('Authorization') for c in chamadas]
+
+
+def usar_pool(monkeypatch, *tokens):
+    credenciais = [app.Credencial(token, {'ACCESS_TOKEN': token}) for token in tokens]
+    monkeypatch.setattr(app.pool_credenciais, 'credenciais', credenciais)
+    return credenciais
+
+
+def test_token_fixo_recusado_nao_volta_a_rotacao(monkeypatch, api_falsa, capsys):
+    credencial, = usar_pool(monkeypatch, TOKEN_RECUSADO)
+
+    # Recusado e sem como renovar: segue sem autenticação (itens são públicos)
+    assert app.requisitar_api('https://api/items/MLB1234567').status_code == 200
+    assert tokens_usados(api_falsa) == [f'Bearer {TOKEN_RECUSADO}', None]
+    assert credencial.token is None
+
+    # Passado o intervalo de espera o token recusado não é reaproveitado
+    credencial.fora_ate = 0
+    api_falsa.clear()
+    assert app.requisitar_api('https://api/items/MLB1234567').status_code == 200
+    assert tokens_usados(api_falsa) == [None]
+
+
+def test_falha_na_renovacao_segue_sem_autenticacao(monkeypatch, api_falsa, capsys):
+    def post_falso(*args, **kwargs):
+        raise app.requests.exceptions.ConnectionError('OAuth fora do ar')
+
+    monkeypatch.setattr(app.requests, 'post', post_falso)
+    monkeypatch.setattr(app, 'historico', app.HistoricoBuscas(50))
+    monkeypatch.setattr(app, 'series_precos', app.SeriesPrecos(1000))
+    credencial = app.Credencial('app', {'CLIENT_ID': 'id', 'CLIENT_SECRET': 'segredo'})
+    monkeypatch.setattr(app.pool_credenciais, 'credenciais', [credencial])
+
+    for _ in range(2):
+        produto = app.buscar_produto_api('MLB1234567')
+        assert produto['id'] == 'MLB1234567'
+    assert tokens_usados(api_falsa) == [None, None]
+    assert credencial.estado()['motivo_fora'] == 'autenticacao'
+
+
+def test_recusa_sem_token_reporta_erro_de_autenticacao(monkeypatch, api_falsa, capsys):
+    usar_pool(monkeypatch, TOKEN_RECUSADO)
+    monkeypatch.setattr(app.sessao_http, 'get', lambda *a, **k: RespostaFalsa(401, {}))
+
+    produto = app.buscar_produto_api('MLB1234567')
+    assert produto['error'].startswith('Falha de autenticação')
+
+
+def test_429_sem_credencial_disponivel_nao_cai_para_anonimo(monkeypatch, api_falsa, capsys):
+    usar_pool(monkeypatch, TOKEN_ESGOTADO)
+
+    response = app.requisitar_api('https://api/items/MLB1')
+    assert response.status_code == 429
+    assert tokens_usados(api_falsa) == [f'Bearer {TOKEN_ESGOTADO}']
+
+    # Credencial fora de rotação: 429 local com Retry-After, sem chamada anônima
+    response = app.requisitar_api('https://api/items/MLB1')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+    assert tokens_usados(api_falsa) == [f'Bearer {TOKEN_ESGOTADO}']
+
+
+def test_sem_credenciais_segue_sem_autenticacao(monkeypatch, api_falsa, capsys):
+    usar_pool(monkeypatch)
+
+    assert app.requisitar_api('https://api/items/MLB1').status_code == 200
+    assert tokens_usados(api_falsa) == [None]
+
+
+@pytest.mark.parametrize('valor', ['', '   ', '{quebrado', '{"CLIENT_ID": "x"}', '["x"]'])
+def test_credenciais_vazias_ou_invalidas_viram_lista_vazia(monkeypatch, valor, capsys):
+    monkeypatch.setenv('CREDENCIAIS', valor)
+    assert app.ler_credenciais_env() == []
+
+
+def test_credenciais_validas(monkeypatch):
+    monkeypatch.setenv('CREDENCIAIS', '[{"CLIENT_ID": "a", "CLIENT_SECRET": "b"}]')
+    assert app.ler_credenciais_env() == [{'CLIENT_ID': 'a', 'CLIENT_SECRET': 'b'}]
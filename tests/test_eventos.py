@@ -0,0 +1,65 @@
+import queue
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def assinantes(monkeypatch):
+    lista = []
+    monkeypatch.setattr(app, 'assinantes_eventos', lista)
+    return lista
+
+
+def assinar(assinantes, canal=None):
+    fila = queue.Queue()
+    assinantes.append((fila, canal))
+    return fila
+
+
+def test_progresso_de_lote_so_vai_para_o_canal_do_lote(assinantes):
+    geral = assinar(assinantes)
+    lote_a = assinar(assinantes, 'a')
+    lote_b = assinar(assinantes, 'b')
+
+    app.publicar_evento('lote', {'lote': 'a'}, canal='a')
+    app.publicar_evento('historico', {'id': 'MLB1234567'}, 1)
+
+    assert lote_a.get_nowait()[0] == 'lote'
+    assert lote_a.empty() and lote_b.empty()
+    assert geral.get_nowait()[0] == 'historico'
+    assert geral.empty()
+
+
+def test_lote_publica_no_canal_escolhido(assinantes, capsys):
+    fila = assinar(assinantes, 'meu-lote')
+    cliente = app.app.test_client()
+
+    response = cliente.post('/lote?lote=meu-lote&buscar=0', data='MLB1234567\nnada aqui')
+    corpo = response.get_data(as_text=True)
+    response.close()
+
+    assert response.headers['X-Lote-Id'] == 'meu-lote'
+    assert '"MLB1234567"' in corpo
+    eventos = []
+    while not fila.empty():
+        eventos.append(fila.get_nowait())
+    assert eventos[-1][0] == 'lote'
+    assert eventos[-1][1]['concluido'] and eventos[-1][1]['lote'] == 'meu-lote'
+
+
+def test_eventos_rejeita_id_de_lote_invalido():
+    response = app.app.test_client().get('/eventos?lote=../x')
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('entrada, motivo', [
+    ('https://www.mercadolivre.com.br/produto/p/MLB19698208', 'URL de catálogo sem item_id'),
+    ('XYZ1234567', 'Nenhum código encontrado'),
+    ('MZZ1234567', 'Prefixo de site desconhecido'),
+])
+def test_buscar_rejeita_entrada_sem_codigo_de_item(entrada, motivo):
+    response = app.app.test_client().post('/buscar', json={'mlb_code': entrada})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': motivo, 'codigo': entrada}
@@ -0,0 +1,47 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def cliente(monkeypatch, api_falsa, capsys):
+    monkeypatch.setattr(app, 'historico', app.HistoricoBuscas(50))
+    monkeypatch.setattr(app, 'series_precos', app.SeriesPrecos(1000))
+    for i in range(3):
+        app.buscar_produto_api(f'MLB{1000000 + i}')
+    return app.app.test_client()
+
+
+def test_resumo_com_o_mesmo_since_responde_304(cliente):
+    primeira = cliente.get('/historico/resumo?since=1')
+    dados = primeira.get_json()
+    assert [p['seq'] for p in dados['itens']] == [3, 2]
+    assert not dados['completo']
+
+    segunda = cliente.get(
+        f"/historico/resumo?since=1&instancia={dados['instancia']}",
+        headers={'If-None-Match': primeira.headers['ETag'].strip('"')}
+    )
+    assert segunda.status_code == 304
+
+    # Nova busca muda a versão: o mesmo ETag deixa de valer
+    app.buscar_produto_api('MLB1000009')
+    terceira = cliente.get(
+        f"/historico/resumo?since=1&instancia={dados['instancia']}",
+        headers={'If-None-Match': primeira.headers['ETag'].strip('"')}
+    )
+    assert terceira.status_code == 200
+    assert terceira.get_json()['itens'][0]['id'] == 'MLB1000009'
+
+
+def test_cursor_de_outra_instancia_recebe_historico_completo(cliente):
+    resposta = cliente.get('/historico/resumo?since=3&instancia=outra-123')
+    dados = resposta.get_json()
+
+    assert dados['completo']
+    assert dados['instancia'] == app.id_instancia()
+    assert len(dados['itens']) == 3
+
+    # Com a instância certa o mesmo cursor não traz nada novo
+    dados = cliente.get(f"/historico/resumo?since=3&instancia={app.id_instancia()}").get_json()
+    assert not dados['completo'] and dados['itens'] == []
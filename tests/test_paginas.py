@@ -0,0 +1,99 @@
+import shutil
+
+import pytest
+
+import app
+from conftest import RespostaFalsa, get_falso, item_falso
+
+TITULO_HTML = '<b>&</b>'
+
+
+@pytest.fixture
+def cliente(monkeypatch, api_falsa, sem_limite_de_taxa, capsys):
+    def get(url, params=None, headers=None, timeout=None):
+        api_falsa.append({'url': url, 'params': params, 'headers': headers})
+        if url.endswith('/MLB1234567'):
+            return RespostaFalsa(200, dict(item_falso('MLB1234567'), title=TITULO_HTML))
+        return get_falso(url, params, headers, timeout)
+
+    monkeypatch.setattr(app.sessao_http, 'get', get)
+    monkeypatch.setattr(app, 'historico', app.HistoricoBuscas(50))
+    monkeypatch.setattr(app, 'series_precos', app.SeriesPrecos(1000))
+    monkeypatch.setattr(app, 'cache_paginas', app.CacheTTL(3600, 50))
+    return app.app.test_client()
+
+
+def obter(cliente, url, etag=None):
+    headers = {'If-None-Match': etag.strip('"')} if etag else {}
+    response = cliente.get(url, headers=headers)
+    response.get_data()
+    response.close()
+    return response
+
+
+@pytest.mark.parametrize('url', ['/exibir-json/MLB1234567', '/visualizar-json/MLB1234567'])
+def test_titulo_com_html_e_escapado(cliente, url):
+    app.buscar_produto_api('MLB1234567')
+    html = obter(cliente, url).get_data(as_text=True)
+
+    assert TITULO_HTML not in html
+    assert '&lt;b&gt;&amp;&lt;/b&gt;' in html
+
+
+def test_pagina_do_historico_responde_304_e_vem_do_cache(cliente):
+    app.buscar_produto_api('MLB1234567')
+    primeira = obter(cliente, '/visualizar-json/MLB1234567')
+    assert primeira.status_code == 200
+    assert len(app.cache_paginas) == 1
+
+    assert obter(cliente, '/visualizar-json/MLB1234567', primeira.headers['ETag']).status_code == 304
+
+    # Nova busca do mesmo item é uma nova versão da página
+    app.buscar_produto_api('MLB1234567')
+    terceira = obter(cliente, '/visualizar-json/MLB1234567', primeira.headers['ETag'])
+    assert terceira.status_code == 200
+    assert terceira.headers['ETag'] != primeira.headers['ETag']
+
+
+def test_exibir_item_sem_mudancas_reaproveita_a_pagina(cliente):
+    primeira = obter(cliente, '/exibir-json/MLB1234567')
+    segunda = obter(cliente, '/exibir-json/MLB1234567', primeira.headers['ETag'])
+
+    assert segunda.status_code == 304
+    assert len(app.cache_paginas) == 1
+
+
+def test_nova_versao_das_paginas_invalida_cache_e_etag(cliente, monkeypatch):
+    primeira = obter(cliente, '/exibir-json/MLB1234567')
+
+    monkeypatch.setattr(app, 'VERSAO_PAGINAS', 'outra-versao')
+    segunda = obter(cliente, '/exibir-json/MLB1234567', primeira.headers['ETag'])
+
+    assert segunda.status_code == 200
+    assert segunda.headers['ETag'] != primeira.headers['ETag']
+    assert len(app.cache_paginas) == 2
+
+
+def test_versao_das_paginas_muda_com_o_template(monkeypatch, tmp_path):
+    pasta = tmp_path / 'templates'
+    shutil.copytree(app.os.path.join(app.app.root_path, app.app.template_folder), pasta)
+    monkeypatch.setattr(app.app, 'template_folder', str(pasta))
+    antes = app.calcular_versao_paginas()
+
+    (pasta / 'exibir_json.html').write_text('<p>novo</p>', encoding='utf-8')
+
+    assert app.calcular_versao_paginas() != antes
+
+
+@pytest.mark.parametrize('url', ['/exibir-json/MLB1234567?leve=1', '/visualizar-json/MLB1234567?leve=1'])
+def test_pagina_leve_carrega_o_json_no_navegador(cliente, api_falsa, url):
+    response = obter(cliente, url)
+    html = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert '⏳ Carregando...' in html
+    assert '/json-raw/MLB1234567' in html
+    # Não busca o item nem precisa dele no histórico
+    assert api_falsa == []
+
+    assert obter(cliente, url, response.headers['ETag']).status_code == 304
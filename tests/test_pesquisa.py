@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+import app
+from conftest import RespostaFalsa, get_falso
+
+
+@pytest.fixture
+def cliente(monkeypatch, api_falsa, sem_limite_de_taxa, capsys):
+    monkeypatch.setattr(app, 'cache_pesquisa', app.CacheTTL(60, 100))
+    return app.app.test_client()
+
+
+def pesquisas(chamadas):
+    return [c for c in chamadas if c['url'].endswith('/search')]
+
+
+def ler_ndjson(response):
+    linhas = response.get_data(as_text=True).splitlines()
+    response.close()
+    return [json.loads(linha) for linha in linhas]
+
+
+def test_consultas_equivalentes_usam_o_cache(cliente, api_falsa):
+    primeira = cliente.get('/pesquisar?q=Fone%20%20Bluetooth&categoria=mlb1000%20')
+    segunda = cliente.get('/pesquisar?q=fone bluetooth&categoria=MLB1000')
+
+    assert primeira.get_json() == segunda.get_json()
+    assert primeira.get_json()['filtros'] == {'q': 'fone bluetooth', 'categoria': 'MLB1000', 'vendedor': ''}
+    assert len(pesquisas(api_falsa)) == 1
+    assert pesquisas(api_falsa)[0]['params'] == {
+        'offset': 0, 'limit': 50, 'q': 'fone bluetooth', 'category': 'MLB1000'
+    }
+
+
+def test_cursor_para_na_janela_de_1000_resultados(cliente, api_falsa):
+    dados = cliente.get('/pesquisar?q=fone&cursor=900').get_json()
+    assert dados['proximo_cursor'] == '950'
+
+    # A última página é cortada no limite da janela e não tem próximo cursor
+    dados = cliente.get('/pesquisar?q=fone&cursor=980').get_json()
+    assert len(dados['itens']) == 20
+    assert dados['proximo_cursor'] is None
+    assert pesquisas(api_falsa)[-1]['params']['limit'] == 20
+
+
+@pytest.mark.parametrize('rota', ['/pesquisar', '/pesquisar/stream'])
+def test_cursor_alem_da_janela_retorna_400(cliente, api_falsa, rota):
+    response = cliente.get(f'{rota}?q=fone&cursor=1000')
+    assert response.status_code == 400
+    assert pesquisas(api_falsa) == []
+
+
+def test_stream_com_detalhes_envia_itens_do_multiget(cliente, api_falsa):
+    itens = ler_ndjson(cliente.get('/pesquisar/stream?q=fone&cursor=990&max=500&detalhes=1'))
+
+    assert [item['codigo'] for item in itens] == [f'MLB{1000990 + i}' for i in range(10)]
+    assert all(item['titulo'] and 'e_full' in item for item in itens)
+    assert pesquisas(api_falsa)[0]['params']['limit'] == 10
+
+
+def test_multiget_que_nao_e_lista_vira_erro_por_item(cliente, monkeypatch):
+    def get(url, params=None, headers=None, timeout=None):
+        if url.endswith('/items'):
+            return RespostaFalsa(200, {'message': 'resposta inesperada'})
+        return get_falso(url, params, headers, timeout)
+
+    monkeypatch.setattr(app.sessao_http, 'get', get)
+    itens = ler_ndjson(cliente.get('/pesquisar/stream?q=fone&max=60&detalhes=1'))
+
+    # Duas páginas (50 + 10): o stream chega ao fim mesmo com todas falhando
+    assert len(itens) == 60
+    assert all(item['error'] == 'Resposta inválida da API' for item in itens)
+
+
+def test_multiget_com_corpo_invalido_nao_interrompe_o_lote(monkeypatch, api_falsa, capsys):
+    def get(url, params=None, headers=None, timeout=None):
+        if url.endswith('/items') and params['ids'].startswith('MLB1000000'):
+            return RespostaFalsa(200, None)
+        return get_falso(url, params, headers, timeout)
+
+    monkeypatch.setattr(app.sessao_http, 'get', get)
+    detalhes = app.detalhar_itens([f'MLB{1000000 + i}' for i in range(25)])
+
+    assert [d.get('error') for d in detalhes[:20]] == ['Resposta inválida da API'] * 20
+    assert [d['codigo'] for d in detalhes[20:]] == [f'MLB{1000020 + i}' for i in range(5)]
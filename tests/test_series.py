@@ -0,0 +1,53 @@
+import app
+
+DIA = 86400
+INICIO = 1_700_000_000
+
+
+def test_velocidade_de_vendas_com_ponto_ancora_antes_do_intervalo():
+    series = app.SeriesPrecos(1000)
+    for n, vendidos in enumerate([10, 20, 30]):
+        series.registrar('MLB1234567', 100.0, 5, vendidos, ts=INICIO + n * DIA)
+
+    resultado = series.consultar('MLB1234567', INICIO + 3600, INICIO + 10 * DIA, DIA)
+
+    assert resultado['pontos'] == 2
+    assert resultado['velocidade_vendas'] == {'vendas': 20, 'dias': 2.0, 'vendas_por_dia': 10.0}
+
+
+def test_velocidade_de_vendas_sem_ponto_ancora():
+    series = app.SeriesPrecos(1000)
+    for n, vendidos in enumerate([10, 20, 30]):
+        series.registrar('MLB1234567', 100.0, 5, vendidos, ts=INICIO + n * DIA)
+
+    resultado = series.consultar('MLB1234567', INICIO, INICIO + 10 * DIA, DIA)
+
+    assert resultado['velocidade_vendas']['vendas_por_dia'] == 10.0
+
+
+def test_numero_de_series_e_limitado_descartando_as_menos_recentes():
+    series = app.SeriesPrecos(1000, max_series=3)
+    for codigo in ['MLB1000001', 'MLB1000002', 'MLB1000003']:
+        series.registrar(codigo, 1.0, 1, 1, ts=INICIO)
+    series.registrar('MLB1000001', 2.0, 1, 1, ts=INICIO + 1)
+    series.registrar('MLB1000004', 1.0, 1, 1, ts=INICIO)
+
+    assert series.consultar('MLB1000002', 0, INICIO + DIA, DIA) is None
+    assert series.consultar('MLB1000001', 0, INICIO + DIA, DIA)['pontos'] == 2
+
+    restaurada = app.SeriesPrecos(1000, max_series=2)
+    restaurada.importar(series.exportar())
+    assert restaurada.consultar('MLB1000003', 0, INICIO + DIA, DIA) is None
+    assert restaurada.consultar('MLB1000004', 0, INICIO + DIA, DIA)['pontos'] == 1
+
+
+def test_lote_e_pesquisa_nao_expulsam_series_buscadas(monkeypatch, api_falsa, capsys):
+    monkeypatch.setattr(app, 'series_precos', app.SeriesPrecos(1000, max_series=3))
+    monkeypatch.setattr(app, 'historico', app.HistoricoBuscas(50))
+    app.buscar_produto_api('MLB1000001')
+
+    detalhes = app.detalhar_itens([f'MLB{2000000 + i}' for i in range(100)])
+
+    assert len(detalhes) == 100
+    assert app.series_precos.consultar('MLB1000001', 0, 2 ** 31, 3600) is not None
+    assert app.series_precos.consultar('MLB2000000', 0, 2 ** 31, 3600) is None
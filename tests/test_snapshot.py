@@ -0,0 +1,73 @@
+import json
+import os
+import runpy
+from types import SimpleNamespace
+
+import pytest
+
+import app
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def estado_isolado(monkeypatch, tmp_path, api_falsa):
+    monkeypatch.setitem(app.DATABASE_CONFIG, 'SNAPSHOT_PATH', str(tmp_path / 'snapshot.json'))
+    monkeypatch.setattr(app, 'historico', app.HistoricoBuscas(50))
+    monkeypatch.setattr(app, 'series_precos', app.SeriesPrecos(1000))
+    monkeypatch.setattr(app, 'versao_snapshot', None)
+    monkeypatch.setattr(app, 'aquecer_conexoes', lambda: None)
+    monkeypatch.setattr(app, 'iniciar_snapshot_periodico', lambda: None)
+    return tmp_path / 'snapshot.json'
+
+
+def ids_no_snapshot(caminho):
+    with open(caminho, encoding='utf-8') as f:
+        return {p['id'] for p in json.load(f)['historico']['itens']}
+
+
+def test_snapshot_ida_e_volta(estado_isolado, capsys):
+    app.buscar_produto_api('MLB1000001')
+    assert app.salvar_snapshot()
+
+    app.historico = app.HistoricoBuscas(50)
+    app.series_precos = app.SeriesPrecos(1000)
+    app.preparar_inicio()
+
+    assert [p['id'] for p in app.historico.listar()] == ['MLB1000001']
+    assert app.series_precos.consultar('MLB1000001', 0, 2 ** 31, 3600) is not None
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requer os.fork')
+def test_worker_reposto_carrega_o_snapshot_mais_novo(estado_isolado, capsys):
+    hooks = runpy.run_path(os.path.join(RAIZ, 'gunicorn.conf.py'))
+    server = SimpleNamespace(cfg=SimpleNamespace(preload_app=True, worker_class_str='gthread', threads=34))
+
+    app.buscar_produto_api('MLB1000001')
+    app.salvar_snapshot()
+    app.historico = app.HistoricoBuscas(50)
+
+    # Master com preload: só tokens, o estado do boot fica vazio
+    hooks['when_ready'](server)
+    assert app.historico.listar() == []
+
+    def worker(mlb_code):
+        pid = os.fork()
+        if pid == 0:
+            codigo = 1
+            try:
+                worker_falso = SimpleNamespace(pid=os.getpid())
+                hooks['post_fork'](server, worker_falso)
+                app.buscar_produto_api(mlb_code)
+                hooks['worker_exit'](server, worker_falso)
+                codigo = 0
+            finally:
+                os._exit(codigo)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+
+    # O segundo worker é forkado do mesmo master depois que o primeiro salvou
+    worker('MLB1000002')
+    worker('MLB1000003')
+
+    assert ids_no_snapshot(estado_isolado) == {'MLB1000001', 'MLB1000002', 'MLB1000003'}